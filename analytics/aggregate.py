@@ -0,0 +1,46 @@
+from typing import Iterable
+
+class AttemptAggregate:
+    """
+    Summary of the whole attempt history, built in a single pass over the attempts.
+
+    Every attempt-level section of the report (totals, difficulty breakdown) reads from the same aggregate, so
+    the attempts table only has to be read once per command. Per-topic sections are grouped in SQL instead.
+    """
+
+    def __init__(self):
+        self.total_attempts = 0
+        self.total_successes = 0
+        self.total_time = 0
+        self.problems = set()
+
+        # difficulty -> [attempts, successes]
+        self.difficulty = {}
+
+    @classmethod
+    def from_attempts(cls, attempts: Iterable[tuple]) -> "AttemptAggregate":
+        """
+        Builds an aggregate from an iterable of attempt rows, e.g. streamed by iter_attempts(). Only the running
+        totals are kept, so memory doesn't grow with the number of attempts.
+        """
+
+        aggregate = cls()
+        for attempt in attempts:
+            aggregate.add(*attempt)
+        return aggregate
+
+    def add(self, slug: str, difficulty: str, topics: str, date: str, time_taken: int, confidence: int, success: int):
+        """
+        Folds a single attempt row into the running totals.
+        """
+
+        self.total_attempts += 1
+        self.total_successes += success
+        self.total_time += time_taken
+        self.problems.add(slug)
+
+        diff = self.difficulty.get(difficulty)
+        if diff is None:
+            diff = self.difficulty[difficulty] = [0, 0]
+        diff[0] += 1
+        diff[1] += success
@@ -0,0 +1,58 @@
+"""
+Reports for every user at once (`report-all`), e.g. for a nightly job. Users are split into chunks handed to a pool
+of worker processes, each with its own read-only connection to the database, and the reports are merged back in
+user id order, so the output is the same whatever the number of workers or chunk size.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+
+import data.database as database
+from data.users import get_user_names
+from analytics.stats import generate_report
+from constants import REPORT_WORKERS, REPORT_CHUNK_SIZE
+from profiling import timed
+
+def _init_worker(db_path: str):
+    database.DB_NAME = db_path
+    database.READ_ONLY = True
+
+
+def _reports(user_ids: list[int]) -> list[str]:
+    return [generate_report(user_id) for user_id in user_ids]
+
+
+@timed()
+def generate_reports(user_ids: list[int] | None = None, workers: int | None = REPORT_WORKERS,
+                     chunk_size: int = REPORT_CHUNK_SIZE) -> dict[int, str]:
+    """
+    Generates the stats report (see generate_report) of every user, or of the users in user_ids.
+
+    Args:
+        user_ids (list[int] | None): Users to report on. Defaults to every user.
+        workers (int | None): Number of worker processes, or None for one per CPU. With 1 worker (or a single
+                              chunk), reports are generated in this process.
+        chunk_size (int): Number of users handed to a worker at a time.
+
+    Returns:
+        dict[int, str]: Mapping user id -> report, in user id order.
+    """
+
+    if user_ids is None:
+        user_ids = get_user_names()
+    user_ids = sorted(user_ids)
+
+    workers = workers or os.cpu_count() or 1
+    chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+    if workers == 1 or len(chunks) <= 1:
+        reports = [report for chunk in chunks for report in _reports(chunk)]
+    else:
+        # Spawned rather than forked, so no worker inherits this process's open connection
+        with ProcessPoolExecutor(
+            min(workers, len(chunks)), mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(os.path.abspath(database.DB_NAME),)
+        ) as pool:
+            reports = [report for chunk_reports in pool.map(_reports, chunks) for report in chunk_reports]
+
+    return dict(zip(user_ids, reports))
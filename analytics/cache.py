@@ -0,0 +1,174 @@
+"""
+Memoisation of analytics results (mastery scores, reports, recommendations), which are read far more often than
+attempts are logged.
+
+Results are keyed on the function, its arguments, today's date (recency depends on it) and a hash of the settings
+in constants.py, and are valid while the database is at the generation they were computed at (see
+data.database.generation, bumped by every write). They are kept in an in-memory LRU per process, and in the
+database's analytics_cache table across processes, so a repeated `stats` is answered without recomputing. Either
+way a cached answer costs one generation lookup.
+
+Stored results are JSON rather than pickles, as a database shared by a cohort mustn't be able to run code in the
+processes reading it. JSON has no tuples, so functions returning (named) tuples pass memoize a load function
+rebuilding them.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+import hashlib
+import inspect
+import json
+import sqlite3
+import time
+from typing import Callable
+
+import constants
+from data.database import connection, generation, transaction
+from data.days import today
+from constants import ANALYTICS_CACHE_SIZE, ANALYTICS_CACHE_DISK_SIZE
+from profiling import count
+
+# Bump when a memoised function's result changes shape, so results stored by older code aren't loaded
+CACHE_FORMAT = 2
+
+# Results depend on the scoring settings too, so any change to constants.py starts a fresh set of disk entries
+_settings = hashlib.sha1(repr((CACHE_FORMAT, sorted(
+    (name, value) for name, value in vars(constants).items() if name.isupper()
+))).encode()).hexdigest()[:16]
+
+# Key -> result for the generation in _generation, least recently used first
+_memory = OrderedDict()
+_generation = None
+
+_enabled = True
+
+def memoize(persist: bool = True, load: Callable | None = None):
+    """
+    Decorator caching a function's results until the next write to the database. Its arguments must be hashable
+    and have a stable repr. Calls made inside a write transaction (which may have changed the data without
+    bumping the generation yet) always compute.
+
+    Args:
+        persist (bool): Whether results are also stored in the database for other processes, as JSON. False for
+                        results that are large or cheap to rebuild.
+        load (Callable | None): Rebuilds a result from its decoded JSON, in which tuples (named or not) come back as
+                                lists. Not needed for results made of dicts, lists, strings and numbers only.
+    """
+
+    def decorate(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        signature = inspect.signature(fn)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            global _generation
+
+            conn = connection()
+            if not _enabled or conn.in_transaction:
+                return fn(*args, **kwargs)
+
+            version = generation(conn)
+            if version != _generation:
+                _memory.clear()
+                _generation = version
+
+            # Binding the arguments, so calculate_mastery(1) and calculate_mastery(user_id=1) share an entry
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name, tuple(bound.arguments.values()), today())
+
+            if key in _memory:
+                count("analytics_cache.hit")
+                _memory.move_to_end(key)
+                return _memory[key]
+
+            disk_key = repr((_settings, *key))
+            if persist:
+                value = _load(conn, disk_key, version, load)
+                if value is not None:
+                    count("analytics_cache.disk_hit")
+                    _remember(key, value)
+                    return value
+
+            count("analytics_cache.miss")
+            value = fn(*args, **kwargs)
+            _remember(key, value)
+            if persist:
+                _store(conn, disk_key, version, value)
+            return value
+
+        return wrapper
+
+    return decorate
+
+
+def _remember(key: tuple, value):
+    _memory[key] = value
+    if len(_memory) > ANALYTICS_CACHE_SIZE:
+        _memory.popitem(last=False)
+
+
+def _load(conn, key: str, version: int, load: Callable | None):
+    row = conn.execute(
+        "SELECT value FROM analytics_cache WHERE key = ? AND generation = ?", (key, version)
+    ).fetchone()
+    if row is None:
+        return None
+
+    try:
+        value = json.loads(row[0])
+        return value if load is None else load(value)
+    except Exception: # Not in the shape this code expects (e.g. written by other code), recomputed instead
+        return None
+
+
+def _store(conn, key: str, version: int, value):
+    """
+    Stores a result in analytics_cache, dropping entries of older generations and, past ANALYTICS_CACHE_DISK_SIZE
+    entries, the oldest ones. Skipped if the database can't be written to right now (locked or read-only), as the
+    result is only a cache: a read command doesn't wait for another process's write to finish just to store it.
+    """
+
+    try:
+        with transaction(conn, data=False, wait=False):
+            conn.execute("DELETE FROM analytics_cache WHERE generation != ?", (version,))
+            conn.execute(
+                "INSERT OR REPLACE INTO analytics_cache(key, generation, value, stored_at) VALUES (?, ?, ?, ?)",
+                (key, version, json.dumps(value), time.time())
+            )
+            conn.execute(
+                """
+                DELETE FROM analytics_cache WHERE key IN (
+                    SELECT key FROM analytics_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (ANALYTICS_CACHE_DISK_SIZE,)
+            )
+    except sqlite3.OperationalError:
+        pass
+
+
+def clear():
+    """
+    Drops every cached result, in memory and in the database.
+    """
+    global _generation
+
+    _memory.clear()
+    _generation = None
+    with transaction(data=False) as conn:
+        conn.execute("DELETE FROM analytics_cache")
+
+
+@contextmanager
+def disabled():
+    """
+    Context manager computing every memoised call within it, e.g. for benchmarking the computations themselves.
+    """
+    global _enabled
+
+    previous, _enabled = _enabled, False
+    try:
+        yield
+    finally:
+        _enabled = previous
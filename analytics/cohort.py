@@ -0,0 +1,83 @@
+"""
+Mastery for a whole cohort at once. Instead of calculate_mastery's query and loop per user, every user's
+per-topic totals are read with one grouped query over the topic buckets, and scored as columns: with NumPy
+when it is installed, and plain Python otherwise.
+
+Scores are the same as calculate_mastery's for every user (within floating point rounding).
+"""
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError: # NumPy is optional, the pure Python pass gives the same scores
+    np = None
+
+from data.days import to_day
+from data.topic_mastery import get_cohort_topic_totals
+from analytics.mastery import window_start, mastery_score, weigh_factors
+from constants import RECENCY_DECAY
+from profiling import timed
+
+def _scores_numpy(columns: list[tuple], today: int) -> list[float]:
+    """
+    Scores (attempts, success_sum, conf_sum, speed_sum, last_day) columns with vectorized array arithmetic.
+    """
+
+    attempts, success_sum, conf_sum, speed_sum, last_day = (np.array(column, dtype=np.float64) for column in columns)
+
+    # Same factors as mastery_score, as columns, weighed by the same function
+    success_rate = success_sum / attempts
+    conf_score = conf_sum / attempts / 5
+    recency = np.exp(-(today - last_day) / RECENCY_DECAY)
+    avg_speed = speed_sum / attempts
+
+    return weigh_factors(success_rate, avg_speed, recency, conf_score).tolist()
+
+
+def _scores_python(columns: list[tuple], today: int) -> list[float]:
+    """
+    Pure Python version of _scores_numpy, used when NumPy isn't installed: mastery_score per row.
+    """
+
+    return [
+        mastery_score(attempts, success_sum, conf_sum, speed_sum, today - last_day)
+        for attempts, success_sum, conf_sum, speed_sum, last_day in zip(*columns)
+    ]
+
+
+@timed()
+def calculate_cohort_mastery(user_ids: list[int] | None = None, decimals: int | None = 2,
+                             vectorized: bool | None = None) -> dict[int, dict[str, float]]:
+    """
+    Calculates calculate_mastery for many users at once.
+
+    Args:
+        user_ids (list[int] | None): Users to score. If None, scores every user with attempts in the window.
+        decimals (int | None): Decimal places scores are rounded to, or None for unrounded scores.
+        vectorized (bool | None): Whether to use NumPy. Defaults to using it if it's installed.
+
+    Returns:
+        dict[int, dict[str, float]]: Mapping user_id -> {topic: mastery score}. Requested users without
+                                     attempts in the window map to an empty dict.
+    """
+
+    if vectorized is None:
+        vectorized = np is not None
+
+    now = datetime.now()
+    rows = get_cohort_topic_totals(window_start(now), user_ids)
+
+    cohort = {user_id: {} for user_id in user_ids or ()}
+    if not rows:
+        return cohort
+
+    # calculate_mastery counts whole days between the last attempt's midnight and now
+    today = to_day(now)
+
+    users, topics, *columns = zip(*rows)
+    scores = _scores_numpy(columns, today) if vectorized else _scores_python(columns, today)
+
+    for user_id, topic, mastery in zip(users, topics, scores):
+        cohort.setdefault(user_id, {})[topic] = mastery if decimals is None else round(mastery, decimals)
+
+    return cohort
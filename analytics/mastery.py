@@ -1,84 +1,119 @@
-from collections import defaultdict
 from datetime import datetime, timedelta
-import math
-from statistics import mean
 
-from data.database_access import get_attempts
+from data.days import to_day
+from data.topic_mastery import get_topic_totals
+from data.users import DEFAULT_USER_ID
+from analytics.scoring import recency_score_days
 from constants import (
-    RECENCY_DECAY, MASTERY_SUCCESS_PROP,
-    MASTERY_SPEED_PROP, MASTERY_RECENCY_PROP,
-    MASTERY_CONF_PROP, EXPECTED_TIMES,
+    MASTERY_SUCCESS_PROP, MASTERY_SPEED_PROP,
+    MASTERY_RECENCY_PROP, MASTERY_CONF_PROP,
     MASTERY_DAYS_WINDOW
     )
+from analytics.cache import memoize
+from profiling import timed
 
-def parse_date(date_str: str) -> datetime:
-    return datetime.strptime(date_str, "%Y-%m-%d")
+class TopicTotals:
+    """
+    Summed mastery inputs for a single topic over the mastery window.
+    """
+
+    __slots__ = ("attempts", "success_sum", "conf_sum", "speed_sum", "last_day")
+
+    def __init__(self, attempts: int, success_sum: int, conf_sum: int, speed_sum: float, last_day: int):
+        self.attempts = attempts
+        self.success_sum = success_sum
+        self.conf_sum = conf_sum
+        self.speed_sum = speed_sum
+        self.last_day = last_day
 
 
-def recency_score(last_date: datetime, now: datetime) -> float:
-    days = (now - last_date).days
-    return math.exp(-days / RECENCY_DECAY)
+def window_start(now: datetime) -> int:
+    """
+    Returns the first day of the mastery window ending at now, as an epoch day (see data.days).
+    """
+
+    cutoff = now - timedelta(days=MASTERY_DAYS_WINDOW)
 
+    # An attempt's date counts as midnight, so the window starts on the first midnight at or after the cutoff
+    first_day = to_day(cutoff)
+    if cutoff.time() != datetime.min.time():
+        first_day += 1
 
-def speed_score(avg_time: float, difficulty: str) -> float:
-    expected = EXPECTED_TIMES.get(difficulty)
-    if avg_time == 0:
-        return 1
-    return min(expected / avg_time, 1)
+    return first_day
 
 
-def calculate_mastery() -> dict[str, float]:
+def load_topic_totals(now: datetime, user_id: int = DEFAULT_USER_ID) -> dict[str, TopicTotals]:
     """
-    Returns dictionary mapping topic -> mastery score (0–1).
-    Only considers attempts within last 60 days (or whatever MASTERY_DAYS_WINDOW) is.
+    Reads a user's per-topic mastery inputs for the window ending at now from the materialized topic buckets.
     """
 
-    attempts = get_attempts()
+    since = window_start(now)
+    topics = {}
 
-    now = datetime.now()
-    cutoff = now - timedelta(days=MASTERY_DAYS_WINDOW)
+    for topic, attempts, success_sum, conf_sum, speed_sum, last_day in get_topic_totals(since, user_id):
+        topics[topic] = TopicTotals(attempts, success_sum, conf_sum, speed_sum, last_day)
+
+    return topics
+
+
+def weigh_factors(success_rate, avg_speed, recency, conf_score):
+    """
+    Combines the mastery factors (each 0–1) into a mastery score with the MASTERY_*_PROP weights. Works on plain
+    numbers and on NumPy arrays of them alike (see analytics.cohort), so there is one definition of the weights.
+    """
 
-    topic_data = defaultdict(list)
+    return (
+        MASTERY_SUCCESS_PROP * success_rate
+        + MASTERY_SPEED_PROP * avg_speed
+        + MASTERY_RECENCY_PROP * recency
+        + MASTERY_CONF_PROP * conf_score
+    )
 
-    for slug, difficulty, topics, date, time_taken, confidence, success in attempts:
-        dt = parse_date(date)
 
-        if dt < cutoff:
-            continue
+def mastery_score(attempts: int, success_sum: int, conf_sum: int, speed_sum: float, days_since_last: int) -> float:
+    """
+    Returns the mastery score (0–1) of a topic from its mastery inputs summed over the window, whose latest attempt
+    was days_since_last days ago.
+    """
 
-        # Grouping each attempt based on topics
-        topic_list = topics.split(",")
+    # Calculating factors that contribute to topic mastery. Each factor is a numerical value between 0 to 1
 
-        for topic in topic_list:
-            topic_data[topic.strip()].append(
-                (difficulty, dt, time_taken, confidence, success)
-            )
+    success_rate = success_sum / attempts
 
-    # Computing mastery scores
-    mastery_scores = {}
+    avg_conf = conf_sum / attempts
+    conf_score = avg_conf / 5 # Dividing by 5 normalises confidence score
 
-    for topic, rows in topic_data.items():
+    recency = recency_score_days(days_since_last)
 
-        # Calculating factors that contribute to topic mastery. Each factor is a numerical value between 0 to 1
+    avg_speed = speed_sum / attempts
 
-        success_rate = mean(r[4] for r in rows)
+    return weigh_factors(success_rate, avg_speed, recency, conf_score)
 
-        avg_conf = mean(r[3] for r in rows)
-        conf_score = avg_conf / 5 # Dividing by 5 normalises confidence score
 
-        last_date = max(r[1] for r in rows)
-        recency = recency_score(last_date, now)
+@timed()
+@memoize()
+def calculate_mastery(user_id: int = DEFAULT_USER_ID, decimals: int | None = 2) -> dict[str, float]:
+    """
+    Returns dictionary mapping topic -> the user's mastery score (0–1), rounded to decimals places (unrounded if
+    None).
+    Only considers attempts within last 60 days (or whatever MASTERY_DAYS_WINDOW) is.
+    The per-topic sums are read from the user's rows of the topic_mastery table, one row per topic.
+    See analytics.cohort for computing every user's scores at once.
+    Results are cached until the next write to the database (see analytics.cache), so callers mustn't modify them.
+    """
 
-        speed_vals = [speed_score(r[2], r[0]) for r in rows]
-        avg_speed = mean(speed_vals)
+    now = datetime.now()
+    today = to_day(now)
+    topics = load_topic_totals(now, user_id)
+
+    # Computing mastery scores
+    mastery_scores = {}
 
-        mastery = (
-            MASTERY_SUCCESS_PROP * success_rate
-            + MASTERY_SPEED_PROP * avg_speed
-            + MASTERY_RECENCY_PROP * recency
-            + MASTERY_CONF_PROP * conf_score
-        )
+    for topic, totals in topics.items():
+        # Whole days since the last attempt's midnight, as recency_score_days counts them
+        mastery = mastery_score(totals.attempts, totals.success_sum, totals.conf_sum, totals.speed_sum,
+                                today - totals.last_day)
 
-        mastery_scores[topic] = round(mastery, 2)
+        mastery_scores[topic] = mastery if decimals is None else round(mastery, decimals)
 
-    return mastery_scores
\ No newline at end of file
+    return mastery_scores
@@ -0,0 +1,163 @@
+"""
+Progress over time: per topic or per difficulty, each day's rolling mastery, success rate and average time over the
+window of days ending on it (MASTERY_DAYS_WINDOW by default, as calculate_mastery uses).
+
+Series are computed from the daily buckets (topic_mastery and difficulty_mastery, maintained as attempts are
+logged) with one range query and a sliding window per group, so a curve over years costs one pass over its
+buckets instead of a calculate_mastery per day.
+"""
+import csv
+import json
+from typing import NamedTuple
+
+from data.days import from_day, to_day, today as current_day
+from data.topic_mastery import get_daily_buckets
+from data.users import DEFAULT_USER_ID
+from analytics.cache import memoize
+from analytics.mastery import mastery_score
+from constants import MASTERY_DAYS_WINDOW
+from profiling import timed
+
+class ProgressPoint(NamedTuple):
+    """
+    A topic's or difficulty's progress on one day. Apart from attempts (made that day), values are over the window
+    of days ending on it.
+    """
+    date: str
+    attempts: int
+    window_attempts: int
+    mastery: float
+    success_rate: float # 0–1
+    avg_time: float # Minutes
+
+
+def _series(buckets: list[tuple], start: int, end: int, window: int, dates: list[str],
+            decimals: int | None) -> list[ProgressPoint]:
+    """
+    Slides the window over a group's buckets (day, attempts, success_sum, conf_sum, speed_sum, time_sum) in day
+    order, returning a point for every day from start to end whose window has attempts. dates[i] is the date of
+    day start + i.
+    """
+
+    points = []
+    attempts = success_sum = conf_sum = time_sum = 0
+    speed_sum = 0.0
+
+    # The window holds buckets[first:last]
+    first = last = 0
+    day = start
+
+    while day <= end:
+        while last < len(buckets) and buckets[last][0] <= day:
+            _, n, success, conf, speed, time_taken = buckets[last]
+            attempts += n
+            success_sum += success
+            conf_sum += conf
+            speed_sum += speed
+            time_sum += time_taken
+            last += 1
+
+        while first < last and buckets[first][0] <= day - window:
+            _, n, success, conf, speed, time_taken = buckets[first]
+            attempts -= n
+            success_sum -= success
+            conf_sum -= conf
+            speed_sum -= speed
+            time_sum -= time_taken
+            first += 1
+
+        # An empty window has no point, so the days until the next bucket are skipped
+        if attempts == 0:
+            if last == len(buckets):
+                break
+            day = max(day + 1, buckets[last][0])
+            continue
+
+        last_day = buckets[last - 1][0]
+        mastery = mastery_score(attempts, success_sum, conf_sum, speed_sum, day - last_day)
+        success_rate = success_sum / attempts
+        avg_time = time_sum / attempts
+
+        if decimals is not None:
+            mastery = round(mastery, decimals)
+            success_rate = round(success_rate, decimals)
+            avg_time = round(avg_time, decimals)
+
+        points.append(ProgressPoint(
+            dates[day - start], buckets[last - 1][1] if last_day == day else 0, attempts, mastery, success_rate,
+            avg_time
+        ))
+        day += 1
+
+    return points
+
+
+@timed()
+@memoize(load=lambda series: {group: [ProgressPoint(*point) for point in points] for group, points in series.items()})
+def progress_series(by: str = "topic", start: str | None = None, end: str | None = None,
+                    user_id: int = DEFAULT_USER_ID, group: str | None = None, window: int = MASTERY_DAYS_WINDOW,
+                    decimals: int | None = 2) -> dict[str, list[ProgressPoint]]:
+    """
+    Returns a user's daily progress per topic or per difficulty between two dates. A day's mastery is the score
+    calculate_mastery would have given on it, so the last point of a series ending today matches it.
+
+    Args:
+        by (str): "topic" or "difficulty".
+        start (str | None): First date (YYYY-MM-DD), inclusive. Defaults to the user's first attempt.
+        end (str | None): Last date (YYYY-MM-DD), inclusive. Defaults to today.
+        user_id (int): User whose progress is returned.
+        group (str | None): If provided, only this topic's or difficulty's progress is returned.
+        window (int): Days each point's values are computed over, ending on its day. 1 for daily values.
+        decimals (int | None): Decimal places values are rounded to, or None for unrounded values.
+
+    Returns:
+        dict[str, list[ProgressPoint]]: Mapping topic or difficulty -> its points in date order, one per day with
+                                        attempts in the window. Groups are sorted by name.
+
+    Raises:
+        KeyError: If by isn't "topic" or "difficulty".
+        ValueError: If start or end isn't a YYYY-MM-DD date.
+    """
+
+    end_day = current_day() if end is None else to_day(end)
+    start_day = None if start is None else to_day(start)
+
+    # Points from start_day on need the buckets of the window before it too
+    rows = get_daily_buckets(by, None if start_day is None else start_day - window + 1, end_day, user_id, group)
+
+    if start_day is None:
+        start_day = rows[0][1] if rows else end_day
+
+    buckets = {}
+    for group, *bucket in rows:
+        buckets.setdefault(group, []).append(bucket)
+
+    # Formatted once per day rather than once per point
+    dates = [from_day(day) for day in range(start_day, end_day + 1)]
+
+    return {
+        group: _series(group_buckets, start_day, end_day, window, dates, decimals)
+        for group, group_buckets in sorted(buckets.items())
+    }
+
+
+FIELDS = ("date", "attempts", "window_attempts", "mastery", "success_rate", "avg_time")
+
+def write_csv(series: dict[str, list[ProgressPoint]], file, by: str = "topic"):
+    """
+    Writes series (see progress_series) to file as CSV, one row per group and date, with a header row.
+    """
+
+    writer = csv.writer(file)
+    writer.writerow((by, *FIELDS))
+    for group, points in series.items():
+        writer.writerows((group, *point) for point in points)
+
+
+def write_json(series: dict[str, list[ProgressPoint]], file):
+    """
+    Writes series (see progress_series) to file as a JSON object mapping each group to its list of points.
+    """
+
+    json.dump({group: [point._asdict() for point in points] for group, points in series.items()}, file)
+    file.write("\n")
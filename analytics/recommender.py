@@ -1,48 +1,178 @@
-from collections import Counter
+import heapq
+from typing import NamedTuple
 
-from data.database_access import get_attempts
+from data.database_access import get_problems_by_topic, get_problem_progress
+from data.days import today
+from data.topic_mastery import get_topic_counts
+from data.users import DEFAULT_USER_ID
+from analytics.cache import memoize
 from analytics.mastery import calculate_mastery
-from constants import MIN_ATTEMPT_RECC_THRESHOLD, NUM_RECC
+from constants import (
+    MIN_ATTEMPT_RECC_THRESHOLD, NUM_RECC,
+    NUM_RECC_PROBLEMS, RECC_STALE_DAYS,
+    RECC_DIFFICULTY_BY_MASTERY
+    )
+from profiling import timed
 
-def count_attempts_per_topic() -> dict[str, int]:
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+
+# Why a problem is recommended, in order of preference: retry a failed problem, refresh a problem solved more
+# than RECC_STALE_DAYS ago, or try a new one
+REASONS = ("failed", "stale", "new")
+
+class ProblemRecommendation(NamedTuple):
+    """
+    A problem recommended for practice, with the reason it was picked (see REASONS).
+    """
+    problem_id: int
+    slug: str
+    title: str
+    difficulty: str
+    reason: str
+
+
+@memoize()
+def count_attempts_per_topic(user_id: int = DEFAULT_USER_ID) -> dict[str, int]:
     """
-    Counts the number of attempts made, for each topic.
+    Counts the number of attempts a user made, for each topic. Cached until the next write to the database.
 
     Returns:
         dict[str, int]: Mapping topic to number of attempts.
     """
 
-    attempts = get_attempts()
-    counts = Counter()
+    return get_topic_counts(user_id)
 
-    for _, _, topics, *_ in attempts:
-        for topic in topics.split(","):
-            topic = topic.strip()
-            if topic:
-                counts[topic] += 1
 
-    return counts
+def _weakest_topics(mastery: dict[str, float], user_id: int, k: int) -> list[tuple[str, float]]:
+    counts = count_attempts_per_topic(user_id)
 
+    # Filter topics with too few attempts
+    eligible = (
+        (topic, score) for topic, score in mastery.items()
+        if counts.get(topic, 0) >= MIN_ATTEMPT_RECC_THRESHOLD
+    )
+
+    # Weakest first. Equal scores are ranked by topic name, so ties come out the same on every call
+    return heapq.nsmallest(k, eligible, key=lambda x: (x[1], x[0]))
 
-def recommend_topics() -> list[tuple[str, float]]:
+
+@timed()
+def recommend_topics(mastery: dict[str, float] | None = None, user_id: int = DEFAULT_USER_ID,
+                     k: int = NUM_RECC) -> list[tuple[str, float]]:
     """
-    Returns list of weakest topics sorted ascending by mastery.
+    Returns list of a user's weakest topics sorted ascending by mastery.
+
+    Args:
+        mastery (dict[str, float] | None): Mastery scores already computed by the caller (e.g. the stats report).
+                                           If None, they are calculated here, and the result is cached until the
+                                           next write to the database.
+        user_id (int): User to recommend topics to.
+        k (int): Max. number of topics to return.
 
     Returns:
         list[tuple[str, int]]: In the form [(topic, mastery_score), ...]
     """
 
-    mastery = calculate_mastery()
-    counts = count_attempts_per_topic()
+    if mastery is not None:
+        return _weakest_topics(mastery, user_id, k)
+
+    return _recommended_topics(user_id, k)
+
+
+@memoize(load=lambda topics: [tuple(pair) for pair in topics])
+def _recommended_topics(user_id: int, k: int) -> list[tuple[str, float]]:
+    return _weakest_topics(calculate_mastery(user_id), user_id, k)
+
+
+# Kept in memory only, as rebuilding it is about as quick as loading it back
+@memoize(persist=False)
+def _problem_index() -> dict[tuple[str, str], list[tuple[int, str, str]]]:
+    """
+    Returns the cached problems indexed by (topic, difficulty), each list sorted by problem id.
+    """
+
+    index = {}
+    for topic, difficulty, problem_id, slug, title in get_problems_by_topic():
+        index.setdefault((topic, difficulty), []).append((problem_id, slug, title))
+    for problems in index.values():
+        problems.sort()
+    return index
 
-    # Filter topics with too few attempts
-    eligible = {
-        topic: score for topic, score in mastery.items()
-        if counts.get(topic, 0) >= MIN_ATTEMPT_RECC_THRESHOLD
-    }
 
-    # Sort with weakest first
-    ranked = sorted(eligible.items(), key=lambda x: x[1])
+def target_difficulty(score: float) -> str:
+    """
+    Returns the difficulty of problems to practise a topic with, given the user's mastery score of it.
+    """
+
+    for max_score, difficulty in RECC_DIFFICULTY_BY_MASTERY.items():
+        if score < max_score:
+            return difficulty
+    return DIFFICULTIES[-1]
+
+
+def _problems_for_topic(topic: str, score: float, progress: dict[int, tuple[int, int]], index: dict,
+                        stale_before: int, k: int) -> list[ProblemRecommendation]:
+    target = DIFFICULTIES.index(target_difficulty(score))
+
+    def candidates():
+        for rank, difficulty in enumerate(DIFFICULTIES):
+            for problem_id, slug, title in index.get((topic, difficulty), ()):
+                solved, last_day = progress.get(problem_id, (None, None))
+
+                if solved is None:
+                    reason = "new"
+                elif not solved:
+                    reason = "failed"
+                elif last_day < stale_before:
+                    reason = "stale"
+                else:
+                    continue
+
+                # Closest to the target difficulty first, then by reason, then by problem id
+                yield abs(rank - target), REASONS.index(reason), problem_id, slug, title, difficulty
+
+    return [
+        ProblemRecommendation(problem_id, slug, title, difficulty, REASONS[reason])
+        for _, reason, problem_id, slug, title, difficulty in heapq.nsmallest(k, candidates())
+    ]
+
+
+@timed()
+def recommend_problems(user_id: int = DEFAULT_USER_ID, topics: list[tuple[str, float]] | None = None,
+                       k: int = NUM_RECC_PROBLEMS) -> dict[str, list[ProblemRecommendation]]:
+    """
+    Recommends problems to practise in each of a user's weakest topics: problems they failed, solved more than
+    RECC_STALE_DAYS ago, or haven't attempted. Problems whose difficulty suits the user's mastery of the topic
+    (see RECC_DIFFICULTY_BY_MASTERY) come first.
+
+    Results are cached until the next write to the database.
+
+    Args:
+        user_id (int): User to recommend problems to.
+        topics (list[tuple[str, float]] | None): (topic, mastery_score) pairs to recommend problems for.
+                                                 Defaults to recommend_topics(user_id=user_id).
+        k (int): Max. number of problems per topic.
+
+    Returns:
+        dict[str, list[ProblemRecommendation]]: Mapping topic -> recommended problems, best first.
+    """
 
-    # Returning only the weakest NUM_RECC number of topics
-    return ranked[:NUM_RECC]
+    if topics is None:
+        topics = recommend_topics(user_id=user_id)
+
+    return _recommended_problems(user_id, tuple(topics), k)
+
+
+@memoize(load=lambda problems: {
+    topic: [ProblemRecommendation(*problem) for problem in topic_problems] for topic, topic_problems in problems.items()
+})
+def _recommended_problems(user_id: int, topics: tuple[tuple[str, float], ...],
+                          k: int) -> dict[str, list[ProblemRecommendation]]:
+    progress = get_problem_progress(user_id)
+    index = _problem_index()
+    stale_before = today() - RECC_STALE_DAYS
+
+    return {
+        topic: _problems_for_topic(topic, score, progress, index, stale_before, k)
+        for topic, score in topics
+    }
@@ -0,0 +1,16 @@
+import math
+
+from constants import RECENCY_DECAY, EXPECTED_TIMES
+
+def recency_score_days(days: int) -> float:
+    """
+    Recency score of an attempt made the given number of whole days ago, decaying over RECENCY_DECAY days.
+    """
+    return math.exp(-days / RECENCY_DECAY)
+
+
+def speed_score(avg_time: float, difficulty: str) -> float:
+    expected = EXPECTED_TIMES.get(difficulty)
+    if avg_time == 0:
+        return 1
+    return min(expected / avg_time, 1)
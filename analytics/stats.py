@@ -1,42 +1,45 @@
-from statistics import mean
-from collections import defaultdict
-
-from data.database_access import get_attempts
+from data.database_access import iter_attempts
+from data.users import DEFAULT_USER_ID
+from analytics.aggregate import AttemptAggregate
 from analytics.mastery import calculate_mastery
-from analytics.recommender import recommend_topics
+from analytics.recommender import recommend_topics, DIFFICULTIES
+from analytics.cache import memoize
+from profiling import timed
 
-def generate_report() -> str:
+@timed()
+@memoize()
+def generate_report(user_id: int = DEFAULT_USER_ID) -> str:
     """
-    Generates a formatted CLI performance report ready for print.
+    Generates a formatted CLI performance report of a user, ready for print. Cached until the next write to the
+    database (see analytics.cache).
     """
 
-    attempts = get_attempts()
+    # Streaming the attempts once, every attempt-level section of the report is computed from this aggregate, so
+    # the history is never held in memory
+    aggregate = AttemptAggregate.from_attempts(iter_attempts(user_id=user_id))
 
-    if not attempts:
+    if not aggregate.total_attempts:
         return "No attempts logged yet."
 
-    total_attempts = len(attempts)
-    unique_problems = len(set(a[0] for a in attempts)) # Making a set of the problem slugs ensures uniqueness
+    total_attempts = aggregate.total_attempts
+    unique_problems = len(aggregate.problems)
 
-    successes = [a[6] for a in attempts]
-    success_rate = mean(successes) * 100
+    success_rate = aggregate.total_successes / total_attempts * 100
 
-    # TODO: probably make minor helper functions to calculate values like average time?
-    avg_time = mean(a[4] for a in attempts)
+    avg_time = aggregate.total_time / total_attempts
 
     # Calculate success rate of each difficulty level
-    diff_data = defaultdict(list)
-
-    for _, difficulty, *_ , success in attempts:
-        diff_data[difficulty].append(success)
-
+    # Listed easiest first, whatever order the attempts were read in
     diff_stats = {
-        d: round(mean(v) * 100, 1)
-        for d, v in diff_data.items()
+        d: round(successes / count * 100, 1)
+        for d, (count, successes) in sorted(
+            aggregate.difficulty.items(),
+            key=lambda x: DIFFICULTIES.index(x[0]) if x[0] in DIFFICULTIES else len(DIFFICULTIES)
+        )
     }
 
     # Calculate strongest and weakest topic
-    mastery = calculate_mastery()
+    mastery = calculate_mastery(user_id)
 
     if mastery:
         strongest = max(mastery.items(), key=lambda x: x[1])
@@ -46,7 +49,7 @@ def generate_report() -> str:
         weakest = ("N/A", 0)
 
     # Getting recommended topics
-    recommendations = recommend_topics()
+    recommendations = recommend_topics(mastery, user_id)
 
     # Formatting for outputting
     lines = []
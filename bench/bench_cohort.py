@@ -0,0 +1,108 @@
+"""
+Compares computing every user's mastery one user at a time, with the original per-attempt scalar loop and with
+calculate_mastery over the topic buckets, against the cohort mode (analytics.cohort), vectorized with NumPy and
+in pure Python. Checks they all agree within 1e-9.
+
+Usage: python -m bench.bench_cohort [num_users] [attempts_per_user]
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+import os
+from statistics import mean
+import sys
+import tempfile
+
+from bench.synthetic import generate
+from bench.timing import measure
+from data.database import close_conn
+from data.database_access import get_attempts
+from analytics import cache
+from analytics.mastery import calculate_mastery
+from analytics.scoring import recency_score_days, speed_score
+from analytics.cohort import calculate_cohort_mastery, np
+from constants import (
+    MASTERY_SUCCESS_PROP, MASTERY_SPEED_PROP,
+    MASTERY_RECENCY_PROP, MASTERY_CONF_PROP,
+    MASTERY_DAYS_WINDOW
+    )
+
+TOLERANCE = 1e-9
+
+def per_attempt_mastery(user_id: int) -> dict[str, float]:
+    """
+    The original calculate_mastery: a Python loop over every attempt, grouping rows per topic and averaging them
+    with statistics.mean.
+    """
+
+    now = datetime.now()
+    cutoff = now - timedelta(days=MASTERY_DAYS_WINDOW)
+
+    topic_data = defaultdict(list)
+
+    for slug, difficulty, topics, date, time_taken, confidence, success in get_attempts(user_id=user_id):
+        dt = datetime.strptime(date, "%Y-%m-%d")
+        if dt < cutoff:
+            continue
+        for topic in topics.split(","):
+            topic_data[topic.strip()].append((difficulty, dt, time_taken, confidence, success))
+
+    mastery_scores = {}
+
+    for topic, rows in topic_data.items():
+        mastery_scores[topic] = (
+            MASTERY_SUCCESS_PROP * mean(r[4] for r in rows)
+            + MASTERY_SPEED_PROP * mean(speed_score(r[2], r[0]) for r in rows)
+            + MASTERY_RECENCY_PROP * recency_score_days((now - max(r[1] for r in rows)).days)
+            + MASTERY_CONF_PROP * mean(r[3] for r in rows) / 5
+        )
+
+    return mastery_scores
+
+
+def per_user(num_users: int, mastery) -> dict[int, dict[str, float]]:
+    return {user_id: mastery(user_id) for user_id in range(1, num_users + 1)}
+
+
+def max_difference(expected: dict, actual: dict) -> float:
+    assert expected.keys() == actual.keys()
+    difference = 0.0
+    for user_id, scores in expected.items():
+        assert scores.keys() == actual[user_id].keys()
+        for topic, score in scores.items():
+            difference = max(difference, abs(score - actual[user_id][topic]))
+    return difference
+
+
+def main():
+    num_users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    attempts_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Spread over the mastery window, so every user has buckets to score
+        generate(os.path.join(tmp, "cohort.db"), num_users * attempts_per_user, num_users=num_users, days=90)
+
+        print(f"mastery for {num_users} users x {attempts_per_user} attempts")
+        expected, scalar = measure("per user (per attempt)", lambda: per_user(num_users, per_attempt_mastery), repeats=1)
+        with cache.disabled():
+            buckets, per_bucket = measure("per user (topic buckets)",
+                                          lambda: per_user(num_users, lambda user_id: calculate_mastery(user_id, None)))
+        print(f"  max difference: {max_difference(expected, buckets):.2e}")
+
+        modes = {"cohort (pure Python)": False}
+        if np is None:
+            print("NumPy isn't installed, skipping the vectorized mode.")
+        else:
+            modes["cohort (NumPy)"] = True
+
+        for label, vectorized in modes.items():
+            cohort, best = measure(label, lambda: calculate_cohort_mastery(decimals=None, vectorized=vectorized))
+            difference = max_difference(expected, cohort)
+            print(f"  max difference: {difference:.2e}, speedup: {scalar / best:.1f}x vs per attempt, "
+                  f"{per_bucket / best:.1f}x vs topic buckets")
+            assert difference <= TOLERANCE
+
+        close_conn()
+
+
+if __name__ == "__main__":
+    main()
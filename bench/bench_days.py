@@ -0,0 +1,64 @@
+"""
+Microbenchmark for date handling over num_attempts attempts: the old text path (strptime to parse each attempt's
+date for recency, strftime to format each review date) against the epoch-day path (integer arithmetic on the
+stored day, from_day to format), then the date-ranged paths that now filter on epoch-day indexes.
+
+Usage: python -m bench.bench_days [num_attempts]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench.synthetic import generate
+from data.database import close_conn, connection
+from data.database_access import iter_attempts
+from data.days import from_day, to_day, today as current_day
+from data.scheduler import get_due_reviews
+from analytics.mastery import calculate_mastery
+from analytics.scoring import recency_score_days
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    fn()
+    print(f"  {label:<40} {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+
+def main():
+    num_attempts = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate(os.path.join(tmp, "bench.db"), num_attempts)
+        conn = connection()
+
+        dates, days = zip(*conn.execute("SELECT date, day FROM attempts"))
+        now = datetime.now()
+        today = current_day()
+
+        print(f"parsing {len(dates)} dates")
+        timed("strptime", lambda: [datetime.strptime(d, "%Y-%m-%d") for d in dates])
+        timed("to_day (fromisoformat)", lambda: [to_day(d) for d in dates])
+
+        print(f"\nrecency of {len(dates)} attempts")
+        timed("strptime + timedelta days", lambda: [
+            recency_score_days((now - datetime.strptime(d, "%Y-%m-%d")).days) for d in dates
+        ])
+        timed("epoch day + recency_score_days", lambda: [recency_score_days(today - d) for d in days])
+
+        offsets = [d % 60 for d in days]
+        print(f"\nformatting {len(offsets)} review dates")
+        timed("timedelta + strftime", lambda: [(now + timedelta(days=o)).strftime("%Y-%m-%d") for o in offsets])
+        timed("from_day", lambda: [from_day(today + o) for o in offsets])
+
+        since = from_day(today - 90)
+        print("\ndate-ranged paths")
+        timed("iter_attempts(since=90 days ago)", lambda: sum(1 for _ in iter_attempts(since=since)))
+        timed("calculate_mastery", calculate_mastery)
+        timed("get_due_reviews", lambda: get_due_reviews(from_day(today)))
+
+        close_conn()
+
+
+if __name__ == "__main__":
+    main()
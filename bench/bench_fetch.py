@@ -0,0 +1,37 @@
+"""
+Times warming the problem cache for a study list against the local stub GraphQL server: one request per slug
+(the old get_or_create_problem loop) versus the batched, concurrent fetch_problems_from_api.
+
+Usage: python -m bench.bench_fetch [num_slugs] [latency_ms]
+"""
+import sys
+import time
+
+from bench.stub_graphql import StubGraphQLServer
+from data.api import fetch_problem_from_api, fetch_problems_from_api
+
+def main():
+    num_slugs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+
+    slugs = [f"problem-{i}" for i in range(1, num_slugs + 1)] + ["not-a-problem"]
+
+    with StubGraphQLServer(latency=latency, rate_limit_every=25) as server:
+        start = time.perf_counter()
+        serial = {slug: fetch_problem_from_api(slug, url=server.url) for slug in slugs}
+        serial_time = time.perf_counter() - start
+        serial_requests = server.requests
+
+        server.requests = 0
+        start = time.perf_counter()
+        batched = fetch_problems_from_api(slugs, url=server.url)
+        batched_time = time.perf_counter() - start
+
+        print(f"{num_slugs} slugs, {latency * 1000:.0f} ms server latency, every 25th request rate limited")
+        print(f"  one request per slug:  {serial_time:.2f} s ({serial_requests} requests)")
+        print(f"  batched + concurrent:  {batched_time:.2f} s ({server.requests} requests)")
+        print(f"  same results:          {serial == batched}")
+
+
+if __name__ == "__main__":
+    main()
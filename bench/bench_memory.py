@@ -0,0 +1,60 @@
+"""
+Measures the peak Python memory (tracemalloc) of the stats report as the attempt history grows, comparing
+reading every attempt into a list first (as get_attempts does) with streaming them through iter_attempts.
+
+SQLite's own page cache is allocated outside Python, so it isn't counted; it is bounded by the storage
+profile's cache_size either way.
+
+Usage: python -m bench.bench_memory [num_attempts ...]
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from bench.synthetic import generate
+from data.database import close_conn
+from data.database_access import get_attempts
+from analytics import cache
+from analytics.aggregate import AttemptAggregate
+from analytics.stats import generate_report
+
+def peak_kib(fn) -> float:
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def listed_report():
+    """
+    The aggregate built from a fully materialised list of attempts.
+    """
+
+    attempts = get_attempts()
+    AttemptAggregate.from_attempts(attempts)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 500_000]
+
+    print(f"{'attempts':>10} {'listed (KiB)':>14} {'streamed (KiB)':>16}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for num_attempts in sizes:
+            generate(os.path.join(tmp, f"bench-{num_attempts}.db"), num_attempts)
+
+            # Warm up the connection and caches, so only the report itself is measured
+            generate_report()
+
+            listed = peak_kib(listed_report)
+            with cache.disabled():
+                streamed = peak_kib(generate_report)
+            print(f"{num_attempts:>10} {listed:>14.0f} {streamed:>16.0f}")
+
+            close_conn()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Times a trainee's mastery-over-time curves from the daily buckets (analytics.progress) against recomputing
+mastery for every day of the range, as calculate_mastery would on each of them (one windowed query per day), and
+checks both give the same scores.
+
+Usage: python -m bench.bench_progress [num_attempts] [days]
+"""
+import os
+import sys
+import tempfile
+
+from bench.synthetic import generate
+from bench.timing import measure
+from data.database import close_conn, connection
+from data.days import from_day, today
+from analytics import cache
+from analytics.mastery import mastery_score
+from analytics.progress import progress_series
+from constants import MASTERY_DAYS_WINDOW
+
+def per_day_mastery(start: int, end: int) -> dict[str, dict[str, float]]:
+    """
+    The naive curve: for each day, every topic's totals over the window ending on it, scored like calculate_mastery.
+    """
+
+    conn = connection()
+    curves = {}
+
+    for day in range(start, end + 1):
+        rows = conn.execute(
+            """
+            SELECT topic, SUM(attempts), SUM(success_sum), SUM(conf_sum), SUM(speed_sum), MAX(day)
+            FROM topic_mastery
+            WHERE user_id = 1 AND day BETWEEN ? AND ?
+            GROUP BY topic
+            """,
+            (day - MASTERY_DAYS_WINDOW + 1, day)
+        )
+        for topic, attempts, success_sum, conf_sum, speed_sum, last_day in rows:
+            curves.setdefault(topic, {})[from_day(day)] = mastery_score(
+                attempts, success_sum, conf_sum, speed_sum, day - last_day
+            )
+
+    return curves
+
+
+def main():
+    num_attempts = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 730
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate(os.path.join(tmp, "bench.db"), num_attempts, days=days)
+
+        end = today()
+        start = end - days + 1
+
+        print(f"{days}-day mastery curves over {num_attempts} attempts")
+        naive, _ = measure("per day (windowed query)", lambda: per_day_mastery(start, end), repeats=1, width=32)
+
+        with cache.disabled():
+            series, _ = measure("rollups, every topic", lambda: progress_series("topic", from_day(start), decimals=None),
+                                width=32)
+            topic = next(iter(series))
+            measure("rollups, one topic", lambda: progress_series("topic", from_day(start), group=topic), width=32)
+            measure("rollups, by difficulty", lambda: progress_series("difficulty", from_day(start)), width=32)
+        measure("cached", lambda: progress_series("topic", from_day(start), decimals=None), width=32)
+
+        difference = max(
+            abs(point.mastery - naive[topic][point.date])
+            for topic, points in series.items() for point in points
+        )
+        print(f"  max difference: {difference:.2e}")
+        assert sum(map(len, series.values())) == sum(map(len, naive.values()))
+
+        close_conn()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Times a trainee's recommendations (weakest topics plus problems to practise in each) on a cold cache, on a warm
+cache, and right after logging an attempt, which invalidates the cache.
+
+Usage: python -m bench.bench_recommend [num_attempts]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bench.synthetic import generate
+from data.database import close_conn
+from data.database_access import log_attempt
+from analytics.recommender import recommend_topics, recommend_problems
+
+def recommend():
+    recommend_problems(topics=recommend_topics())
+
+
+def median_ms(fn, setup=None, repeats: int = 20) -> float:
+    samples = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    num_attempts = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate(os.path.join(tmp, "bench.db"), num_attempts, days=180)
+
+        print(f"recommendations over {num_attempts} attempts")
+        print(f"{'cold (first request)':<26} {median_ms(recommend, repeats=1):8.2f} ms")
+        print(f"{'warm (cached)':<26} {median_ms(recommend):8.2f} ms")
+        print(f"{'after log_attempt':<26} "
+              f"{median_ms(recommend, setup=lambda: log_attempt('problem-1', today, 20, 3, 1)):8.2f} ms")
+
+        close_conn()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Scaling of `report-all` (analytics.batch.generate_reports) with the number of worker processes, on a synthetic
+cohort database. Checks every worker count gives the same reports.
+
+Speedups are bounded by the CPUs available (printed first): worker counts beyond them only add process startup.
+
+Usage: python -m bench.bench_report_all [num_users] [attempts_per_user] [workers,...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from bench.synthetic import generate
+from data.database import close_conn
+from analytics import cache
+from analytics.batch import generate_reports
+from constants import REPORT_CHUNK_SIZE
+
+WORKERS = (1, 2, 4, 8)
+
+def main():
+    num_users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    attempts_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    workers = [int(n) for n in sys.argv[3].split(",")] if len(sys.argv) > 3 else WORKERS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate(os.path.join(tmp, "cohort.db"), num_users * attempts_per_user, num_users=num_users)
+
+        print(f"reports for {num_users} users x {attempts_per_user} attempts, {os.cpu_count()} CPUs, "
+              f"{REPORT_CHUNK_SIZE} users per chunk")
+
+        expected = None
+        baseline = None
+
+        for n in workers:
+            # Every run computes its reports (workers can't write the cache, and this process is kept from reading it)
+            cache.clear()
+            with cache.disabled():
+                start = time.perf_counter()
+                reports = generate_reports(workers=n)
+                elapsed = time.perf_counter() - start
+
+            baseline = baseline or elapsed
+            print(f"  {n} worker{'s' if n > 1 else ' '}   {elapsed:8.2f} s   speedup: {baseline / elapsed:5.2f}x")
+
+            expected = expected or reports
+            assert reports == expected
+
+        close_conn()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures CLI startup: wall time of `python main.py <command>` for cheap commands, and the slowest imports
+reported by `python -X importtime`. Exits with status 1 if any command's median time is over STARTUP_BUDGET_MS,
+so it can gate CI.
+
+Usage: python -m bench.bench_startup [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Budget for the median run of each command, including interpreter startup
+STARTUP_BUDGET_MS = 100
+
+COMMANDS = [["help"], ["reviews"], ["schedule"]]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+
+def time_command(args: list[str], cwd: str, runs: int) -> float:
+    """
+    Returns the median wall time in milliseconds of running main.py with args.
+    """
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, MAIN, *args], cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def slowest_imports(args: list[str], cwd: str, top: int = 8) -> list[tuple[int, str]]:
+    """
+    Returns the top modules by cumulative import time (microseconds) when running main.py with args.
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", MAIN, *args],
+        cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), name.strip()))
+
+    return sorted(imports, reverse=True)[:top]
+
+
+def main() -> int:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    over_budget = False
+
+    # Run in an empty directory, so the commands create and use a fresh leetcode.db there
+    with tempfile.TemporaryDirectory() as tmp:
+
+        for args in COMMANDS:
+            median = time_command(args, tmp, runs)
+            over = median > STARTUP_BUDGET_MS
+            over_budget |= over
+            print(f"{'OVER' if over else 'ok':<5} {' '.join(args):<10} {median:6.1f} ms (budget {STARTUP_BUDGET_MS} ms)")
+
+        print("\nSlowest imports for 'reviews' (cumulative):")
+        for cumulative, name in slowest_imports(["reviews"], tmp):
+            print(f"  {cumulative / 1000:6.1f} ms  {name}")
+
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
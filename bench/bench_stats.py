@@ -0,0 +1,70 @@
+"""
+Compares the number of attempts-table scans and wall time of the stats command, before and after the shared
+single-pass aggregate, and of calculate_mastery over the materialized topic buckets. These are computed on every
+call, unlike the last line, a report answered from analytics.cache.
+
+Usage: python -m bench.bench_stats [num_attempts]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+
+from bench.synthetic import generate
+from bench.timing import measure
+from data.database import close_conn
+from data.database_access import get_attempts
+from analytics.aggregate import AttemptAggregate
+from analytics import cache
+from analytics.mastery import calculate_mastery
+from analytics.stats import generate_report
+
+_connect = sqlite3.connect
+scans = 0
+
+def _count_scans(statement: str):
+    global scans
+    if "FROM attempts" in statement:
+        scans += 1
+
+
+def _traced_connect(*args, **kwargs):
+    conn = _connect(*args, **kwargs)
+    conn.set_trace_callback(_count_scans)
+    return conn
+
+
+def _reset_scans():
+    global scans
+    scans = 0
+
+
+def per_section_report():
+    """
+    The old call pattern, where every report section read the attempts table for itself.
+    """
+
+    # generate_report, calculate_mastery, and recommend_topics' calculate_mastery and count_attempts_per_topic
+    for _ in range(4):
+        AttemptAggregate.from_attempts(get_attempts())
+
+
+def main():
+    num_attempts = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate(os.path.join(tmp, "bench.db"), num_attempts)
+        sqlite3.connect = _traced_connect
+        close_conn()
+
+        print(f"stats over {num_attempts} attempts")
+        counted = {"before": _reset_scans, "details": lambda: f"scans: {scans}"}
+        with cache.disabled():
+            measure("before (per-section reads)", per_section_report, **counted)
+            measure("after (single pass)", generate_report, **counted)
+            measure("mastery (topic buckets)", calculate_mastery, **counted)
+        measure("cached", generate_report, **counted)
+
+
+if __name__ == "__main__":
+    main()
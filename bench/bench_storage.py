@@ -0,0 +1,95 @@
+"""
+Compares the SQLite storage profiles from constants.py: single-attempt log throughput, and read latency of the
+stats queries while another process keeps logging attempts.
+
+Usage: python -m bench.bench_storage [num_logs]
+"""
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import data.database as database
+from bench.synthetic import generate
+from data.database import close_conn
+from data.database_access import log_attempt
+from analytics import cache
+from analytics.mastery import calculate_mastery
+from constants import STORAGE_PROFILES
+
+def log_many(num_logs: int) -> float:
+    """
+    Logs num_logs attempts, each committed on its own like separate `log` commands. Returns the elapsed time.
+    """
+
+    start = time.perf_counter()
+    for i in range(num_logs):
+        log_attempt(f"problem-{i % 500 + 1}", "2026-01-01", 20, i % 5 + 1, i % 2)
+    return time.perf_counter() - start
+
+
+def _writer(profile: str, path: str, writing, stop):
+    database.STORAGE_PROFILE = profile
+    database.DB_NAME = path
+    while not stop.is_set():
+        log_many(10)
+        writing.set()
+
+
+def read_latencies(num_reads: int) -> tuple[list[float], int]:
+    """
+    Times calculate_mastery num_reads times. Returns the latencies and the number of reads that failed
+    (e.g. "database is locked").
+    """
+
+    latencies = []
+    errors = 0
+    for _ in range(num_reads):
+        start = time.perf_counter()
+        try:
+            calculate_mastery()
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+def main():
+    num_logs = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    for profile in STORAGE_PROFILES:
+        database.STORAGE_PROFILE = profile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "storage.db")
+            generate(path, 20_000, num_problems=500)
+
+            elapsed = log_many(num_logs)
+
+            # Spawned rather than forked, so the writer doesn't inherit this process's open connection
+            context = multiprocessing.get_context("spawn")
+            writing, stop = context.Event(), context.Event()
+            writer = context.Process(target=_writer, args=(profile, path, writing, stop))
+            writer.start()
+            writing.wait()
+
+            # Timing the reads themselves, not analytics.cache
+            with cache.disabled():
+                latencies, errors = read_latencies(200)
+
+            stop.set()
+            writer.join()
+            close_conn()
+
+        latencies.sort()
+        print(f"profile {profile}")
+        print(f"  log throughput:          {num_logs / elapsed:.0f} attempts/s")
+        print(f"  read p50 (with writer):  {statistics.median(latencies) * 1000:.2f} ms")
+        print(f"  read p99 (with writer):  {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+        print(f"  failed reads:            {errors}")
+
+
+if __name__ == "__main__":
+    main()
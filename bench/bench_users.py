@@ -0,0 +1,80 @@
+"""
+Load benchmark for one database shared by a cohort: generates num_users users with attempts_per_user attempts
+each, then times the per-user paths (mastery, stats report, due reviews and logging an attempt) for a random
+sample of users. The same paths are timed on a single-user database with one user's worth of attempts, so the
+cost of sharing the database shows up as the difference between the two.
+
+Usage: python -m bench.bench_users [num_users] [attempts_per_user] [sample_size]
+The defaults are the 1k users x 10k attempts cohort (10M attempts), which takes a few minutes to generate.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bench.synthetic import generate
+from bench.timing import percentile
+from data.database import close_conn
+from data.database_access import log_attempt
+from data.scheduler import get_due_reviews
+from analytics.mastery import calculate_mastery
+from analytics.stats import generate_report
+
+PATHS = {
+    "calculate_mastery": lambda user_id, today: calculate_mastery(user_id),
+    "generate_report": lambda user_id, today: generate_report(user_id),
+    "get_due_reviews": lambda user_id, today: get_due_reviews(today, user_id),
+    "log_attempt": lambda user_id, today: log_attempt("problem-1", today, 20, 3, 1, user_id),
+}
+
+
+def measure(user_ids: list[int]) -> dict[str, list[float]]:
+    """
+    Times every path once per user in user_ids, returning the latencies in seconds.
+    """
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    timings = {name: [] for name in PATHS}
+
+    for user_id in user_ids:
+        for name, run in PATHS.items():
+            start = time.perf_counter()
+            run(user_id, today)
+            timings[name].append(time.perf_counter() - start)
+
+    return timings
+
+
+def report(label: str, timings: dict[str, list[float]]):
+    print(label)
+    for name, samples in timings.items():
+        print(f"  {name:<18} p50: {statistics.median(samples) * 1000:7.2f} ms   "
+              f"p99: {percentile(samples, 99) * 1000:7.2f} ms")
+
+
+def main():
+    num_users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    attempts_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    sample_size = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate(os.path.join(tmp, "single.db"), attempts_per_user)
+        report(f"single user, {attempts_per_user} attempts", measure([1] * sample_size))
+        close_conn()
+
+        start = time.perf_counter()
+        generate(os.path.join(tmp, "cohort.db"), num_users * attempts_per_user, num_users=num_users)
+        print(f"\ngenerated {num_users} users x {attempts_per_user} attempts in {time.perf_counter() - start:.1f}s")
+
+        sample = [rng.randint(1, num_users) for _ in range(sample_size)]
+        report(f"{num_users} users, {sample_size} sampled", measure(sample))
+        close_conn()
+
+
+if __name__ == "__main__":
+    main()
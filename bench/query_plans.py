@@ -0,0 +1,103 @@
+"""
+Runs the hot-path queries against a small synthetic database and checks with EXPLAIN QUERY PLAN that none of
+them fall back to a full table scan. Exits with status 1 if any do, so it can gate CI.
+
+Usage: python -m bench.query_plans
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+
+from bench.synthetic import generate
+from data.database import close_conn
+from data.database_access import get_attempts, iter_attempts
+from data.scheduler import (
+    get_due_reviews, show_due_reviews, schedule_review, iter_reviews, next_reviews, ReviewCursor, replay_review_states
+    )
+from data.topic_mastery import get_topic_totals, get_daily_buckets
+from data.days import to_day
+
+# Tables that are expected to be read in full (e.g. small lookup tables)
+ALLOWED_SCANS = {"topics", "t"}
+
+_connect = sqlite3.connect
+statements = []
+
+def _traced_connect(*args, **kwargs):
+    conn = _connect(*args, **kwargs)
+    conn.set_trace_callback(statements.append)
+    return conn
+
+
+HOT_PATHS = {
+    "due reviews (ids)": lambda: get_due_reviews("2026-01-01"),
+    "due reviews (slugs)": lambda: show_due_reviews("2026-01-01"),
+    "review listing (due)": lambda: list(iter_reviews(until="2026-01-01")),
+    "review listing (page)": lambda: list(iter_reviews(after=("2026-01-01", 5), limit=20)),
+    "review queue": lambda: next_reviews(today="2026-01-01", mastery={"Graph": 0.5}),
+    "review queue (page)": lambda: next_reviews(after=ReviewCursor(to_day("2025-12-01"), 5, 20), today="2026-01-01"),
+    "review state replay (problem)": lambda: replay_review_states(user_id=1, problem_ids=[7]),
+    "review state replay (user)": lambda: replay_review_states(user_id=1),
+    "attempts since date": lambda: get_attempts(since="2026-01-01"),
+    "attempts for topic": lambda: get_attempts(topic="Graph"),
+    "attempts in date range": lambda: list(iter_attempts(since="2026-01-01", until="2026-01-31")),
+    "attempts for problem": lambda: list(iter_attempts(problem_id=7)),
+    "attempts for difficulty": lambda: list(iter_attempts(difficulty="Hard", since="2026-01-01")),
+    "mastery window": lambda: get_topic_totals(to_day("2026-01-01")),
+    "progress by topic": lambda: get_daily_buckets("topic", to_day("2025-06-01"), to_day("2026-01-01")),
+    "progress of one topic": lambda: get_daily_buckets("topic", None, to_day("2026-01-01"), group="Graph"),
+    "progress by difficulty": lambda: get_daily_buckets("difficulty", to_day("2025-06-01"), to_day("2026-01-01")),
+}
+
+
+def full_scans(conn, statement: str) -> list[str]:
+    """
+    Returns the full-table SCAN steps in the statement's query plan.
+    """
+
+    plan = conn.execute("EXPLAIN QUERY PLAN " + statement).fetchall()
+    scans = []
+    for *_, detail in plan:
+        words = detail.split()
+        if words[0] == "SCAN" and "INDEX" not in words and words[1] not in ALLOWED_SCANS:
+            scans.append(detail)
+    return scans
+
+
+def main() -> int:
+    failures = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "plans.db")
+        generate(path, 5000, num_problems=500)
+        for problem_id in range(1, 50):
+            schedule_review(problem_id, 3, 1)
+
+        sqlite3.connect = _traced_connect
+        close_conn()
+        conn = _connect(path)
+
+        for name, run in HOT_PATHS.items():
+            statements.clear()
+            run()
+
+            scans = [
+                scan for statement in statements
+                if statement.lstrip().upper().startswith("SELECT")
+                for scan in full_scans(conn, statement)
+            ]
+
+            print(f"{'FAIL' if scans else 'ok':<5} {name}")
+            for scan in scans:
+                print(f"        {scan}")
+            failures += bool(scans)
+
+        conn.close()
+        sqlite3.connect = _connect
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Local stand-in for LeetCode's GraphQL endpoint, so the API client can be exercised offline.
+
+It answers question(titleSlug:) fields (aliased or not) for slugs of the form "problem-<id>", returning null for
+any other slug, and pages of the full questionList over problems 1..catalog_size. It can add latency and
+rate-limit every n-th request.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import threading
+import time
+
+from bench.synthetic import DIFFICULTIES, TOPICS
+
+QUESTION_FIELD = re.compile(r"(?:(\w+)\s*:\s*)?question\(titleSlug:\s*\$(\w+)\)")
+
+def question(slug: str) -> dict | None:
+    match = re.fullmatch(r"problem-(\d+)", slug)
+    if not match:
+        return None
+
+    problem_id = int(match.group(1))
+    return {
+        "questionFrontendId": str(problem_id),
+        "title": f"Problem {problem_id}",
+        "difficulty": DIFFICULTIES[problem_id % len(DIFFICULTIES)],
+        "topicTags": [{"name": TOPICS[(problem_id + i) % len(TOPICS)]} for i in range(problem_id % 3 + 1)]
+    }
+
+
+class StubGraphQLServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0, rate_limit_every: int = 0, catalog_size: int = 3000):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.catalog_size = catalog_size
+        self.rate_limit_every = rate_limit_every
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/graphql"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Replies are written as headers, then body. On a kept-alive connection Nagle's algorithm would hold the body
+    # back until the client's delayed ACK (~40 ms), swamping the configured latency
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        with self.server._lock:
+            self.server.requests += 1
+            count = self.server.requests
+
+        time.sleep(self.server.latency)
+
+        if self.server.rate_limit_every and count % self.server.rate_limit_every == 0:
+            self._reply(429, {"errors": [{"message": "Too many requests"}]}, {"Retry-After": "0"})
+            return
+
+        if "questionList" in body["query"]:
+            self._reply(200, {"data": {"problemsetQuestionList": self._problem_list(body["variables"])}})
+            return
+
+        data = {
+            alias or "question": question(body["variables"][variable])
+            for alias, variable in QUESTION_FIELD.findall(body["query"])
+        }
+        self._reply(200, {"data": data})
+
+    def _problem_list(self, variables: dict) -> dict:
+        first = variables["skip"] + 1
+        last = min(variables["skip"] + variables["limit"], self.server.catalog_size)
+
+        return {
+            "total": self.server.catalog_size,
+            "questions": [{"titleSlug": f"problem-{i}", **question(f"problem-{i}")} for i in range(first, last + 1)]
+        }
+
+    def _reply(self, status: int, payload: dict, headers: dict | None = None):
+        raw = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(raw)
@@ -0,0 +1,219 @@
+"""
+Benchmark suite for the data paths behind the CLI commands (`stats`, `recommend`, `progress`, `reviews`, `schedule`
+and `log`), over synthetic databases of SIZES attempts on NUM_PROBLEMS problems (see bench.synthetic, which inserts
+problems directly, so everything runs offline).
+
+For each size, every path is timed end to end in a fresh process, reporting its p50/p99 latency and the number of
+SQL statements it runs per call, along with the process's peak RSS. Results can be written as JSON and compared
+against an earlier run's.
+
+Usage: python -m bench.suite [--sizes 1000,10000,...] [--repeats N] [--json FILE] [--baseline FILE] [--keep DIR]
+Databases are generated into a temporary directory, or into --keep DIR where they are reused by later runs (the
+few attempts logged by log_attempt accumulate in them). The 10M attempt database takes a few minutes to generate.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError: # Not available on Windows, where peak RSS isn't reported
+    resource = None
+
+from bench.synthetic import generate, use_database
+from bench.timing import percentile
+from data.database import close_conn, connection
+from data.database_access import log_attempt
+from data.days import from_day, today
+from data.scheduler import get_due_reviews, get_review_schedule, next_reviews
+from analytics import cache
+from analytics.mastery import calculate_mastery
+from analytics.progress import progress_series
+from analytics.recommender import recommend_topics
+from analytics.stats import generate_report
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+NUM_PROBLEMS = 3000
+
+# Once a path has been timed for this many seconds (and at least MIN_REPEATS times), it stops being repeated, so
+# the largest sizes finish in reasonable time
+PATH_BUDGET_SECONDS = 30
+MIN_REPEATS = 3
+
+def _paths() -> dict:
+    """
+    Returns the timed paths, name -> function. Analytics results are computed on every call (see analytics.cache),
+    except by the "(cached)" paths.
+    """
+
+    date = from_day(today())
+
+    def log():
+        log_attempt("problem-1", date, 20, 3, 1)
+
+    return {
+        "generate_report": generate_report,
+        "generate_report (cached)": generate_report,
+        "calculate_mastery": calculate_mastery,
+        "recommend_topics": recommend_topics,
+        "progress_series": progress_series,
+        "get_due_reviews": get_due_reviews,
+        "next_reviews": lambda: next_reviews(mastery=calculate_mastery()),
+        "get_review_schedule": get_review_schedule,
+        "log_attempt": log,
+    }
+
+
+def peak_rss() -> int | None:
+    """
+    Returns this process's peak resident set size in bytes, or None where it can't be read.
+    """
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 # Linux reports KiB, macOS bytes
+
+
+def measure(path: str, repeats: int) -> dict:
+    """
+    Times every path against the database at path. Runs in its own process (see run_size), so peak RSS is this
+    database's alone.
+    """
+
+    use_database(path)
+
+    statements = 0
+
+    def count(_statement: str):
+        nonlocal statements
+        statements += 1
+
+    connection().set_trace_callback(count)
+
+    results = {}
+    for name, run in _paths().items():
+        samples = []
+        counts = []
+        spent = 0.0
+
+        for _ in range(repeats):
+            with nullcontext() if name.endswith("(cached)") else cache.disabled():
+                statements = 0
+                start = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - start
+
+            samples.append(elapsed)
+            counts.append(statements)
+            spent += elapsed
+            if len(samples) >= MIN_REPEATS and spent > PATH_BUDGET_SECONDS:
+                break
+
+        results[name] = {
+            "runs": len(samples),
+            "p50_ms": statistics.median(samples) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+            "sql_statements": statistics.median(counts),
+        }
+
+    return {"paths": results, "peak_rss_bytes": peak_rss()}
+
+
+def run_size(num_attempts: int, directory: str, repeats: int) -> dict:
+    """
+    Generates (or reuses) the database with num_attempts attempts in directory, and measures it in a child process.
+    """
+
+    path = os.path.join(directory, f"attempts-{num_attempts}.db")
+    generate_seconds = None
+
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        generate(path, num_attempts, num_problems=NUM_PROBLEMS)
+        close_conn()
+        generate_seconds = time.perf_counter() - start
+
+    child = subprocess.run(
+        [sys.executable, "-m", "bench.suite", "--measure", path, "--repeats", str(repeats)],
+        check=True, stdout=subprocess.PIPE, text=True
+    )
+
+    return {
+        "attempts": num_attempts,
+        "problems": NUM_PROBLEMS,
+        "generate_seconds": generate_seconds,
+        "db_bytes": os.path.getsize(path),
+        **json.loads(child.stdout),
+    }
+
+
+def print_size(result: dict, baseline: dict | None):
+    rss = result["peak_rss_bytes"]
+    print(f"\n{result['attempts']:,} attempts"
+          + (f", peak RSS {rss / 2**20:.1f} MiB" if rss is not None else ""))
+
+    for name, path in result["paths"].items():
+        line = (f"  {name:<26} p50: {path['p50_ms']:9.2f} ms   p99: {path['p99_ms']:9.2f} ms   "
+                f"sql: {path['sql_statements']:6.0f}")
+
+        before = (baseline or {}).get(name)
+        if before:
+            line += f"   p50 vs baseline: {path['p50_ms'] / before['p50_ms']:5.2f}x"
+        print(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the CLI's data paths over synthetic databases.")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)),
+                        help="comma-separated numbers of attempts (default: %(default)s)")
+    parser.add_argument("--repeats", type=int, default=20, help="max. timed calls per path (default: %(default)s)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare p50 latencies with the results in this JSON file")
+    parser.add_argument("--keep", help="generate databases into this directory and reuse them on later runs")
+    parser.add_argument("--measure", help=argparse.SUPPRESS) # Child process mode, see run_size
+    args = parser.parse_args()
+
+    if args.measure:
+        json.dump(measure(args.measure, args.repeats), sys.stdout)
+        return 0
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {size["attempts"]: size["paths"] for size in json.load(f)["sizes"]}
+
+    results = {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "repeats": args.repeats,
+        "sizes": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.keep or tmp
+        os.makedirs(directory, exist_ok=True)
+
+        for num_attempts in (int(size) for size in args.sizes.split(",")):
+            result = run_size(num_attempts, directory, args.repeats)
+            results["sizes"].append(result)
+            print_size(result, baseline.get(num_attempts))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
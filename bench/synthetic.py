@@ -0,0 +1,103 @@
+from itertools import accumulate
+import random
+from datetime import datetime, timedelta
+
+import data.database as database
+from data.database import init_db, link_topics, transaction
+from data.scheduler import replay_review_states
+from data.topic_mastery import rebuild_topic_mastery
+
+# Topics with roughly how many LeetCode problems are tagged with each, so common topics (Array, String) get most
+# of the attempts as they do in practice
+TOPIC_WEIGHTS = {
+    "Array": 1800, "String": 750, "Hash Table": 650, "Dynamic Programming": 550, "Math": 550, "Sorting": 420,
+    "Greedy": 400, "Depth-First Search": 300, "Binary Search": 280, "Breadth-First Search": 250, "Tree": 240,
+    "Matrix": 230, "Two Pointers": 220, "Bit Manipulation": 230, "Stack": 170, "Heap (Priority Queue)": 170,
+    "Graph": 160, "Sliding Window": 140, "Backtracking": 110, "Linked List": 80, "Union Find": 80, "Trie": 60,
+}
+TOPICS = list(TOPIC_WEIGHTS)
+_TOPIC_CUM_WEIGHTS = list(accumulate(TOPIC_WEIGHTS.values()))
+
+# Roughly the Easy/Medium/Hard split of the LeetCode problem set
+DIFFICULTIES = (["Easy"] * 25) + (["Medium"] * 52) + (["Hard"] * 23)
+
+def use_database(path: str):
+    """
+    Points the data layer at the database file at path, creating the schema if needed.
+    """
+
+    database.DB_NAME = path
+    init_db()
+
+
+def sample_topics(rng: random.Random, k: int) -> list[str]:
+    """
+    Picks k distinct topics, each with a chance proportional to its TOPIC_WEIGHTS.
+    """
+
+    topics = []
+    while len(topics) < k:
+        topic = rng.choices(TOPICS, cum_weights=_TOPIC_CUM_WEIGHTS)[0]
+        if topic not in topics:
+            topics.append(topic)
+    return topics
+
+
+def generate(path: str, num_attempts: int, num_problems: int = 3000, days: int = 730, seed: int = 0,
+             num_users: int = 1):
+    """
+    Writes a synthetic history of num_attempts attempts over num_problems problems into the database at path,
+    dealt round-robin to num_users users (ids 1..num_users, user 1 being the default user), with a pending
+    review of every problem each user attempted. Problems are inserted directly, so no LeetCode API calls are
+    made.
+    """
+
+    rng = random.Random(seed)
+    use_database(path)
+
+    problems = []
+    for problem_id in range(1, num_problems + 1):
+        difficulty = rng.choice(DIFFICULTIES)
+        topics = sample_topics(rng, rng.randint(1, 4))
+        problems.append((problem_id, f"problem-{problem_id}", f"Problem {problem_id}", difficulty, ",".join(topics)))
+
+    today = datetime.now()
+    dates = [(today - timedelta(days=days - day)).strftime("%Y-%m-%d") for day in range(days + 1)]
+
+    def attempts():
+        for i in range(num_attempts):
+            date = dates[rng.randrange(days + 1)]
+            yield (
+                i % num_users + 1,
+                rng.randint(1, num_problems),
+                date,
+                rng.randint(3, 90),
+                rng.randint(1, 5),
+                int(rng.random() < 0.7),
+            )
+
+    with transaction() as conn:
+        cur = conn.cursor()
+
+        cur.executemany(
+            "INSERT OR IGNORE INTO problems(id,slug,title,difficulty,topics) VALUES(?,?,?,?,?)",
+            problems
+        )
+        for problem_id, _, _, _, topics in problems:
+            link_topics(cur, problem_id, topics.split(","))
+
+        cur.executemany(
+            "INSERT OR IGNORE INTO users(id, name) VALUES (?, ?)",
+            [(user_id, f"user-{user_id}") for user_id in range(2, num_users + 1)]
+        )
+
+        cur.executemany(
+            """
+            INSERT INTO attempts(user_id, problem_id, date, time_taken, confidence, success)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            attempts()
+        )
+
+        rebuild_topic_mastery(conn)
+        replay_review_states(conn)
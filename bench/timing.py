@@ -0,0 +1,43 @@
+"""
+Timing helpers shared by the benchmarks.
+"""
+import time
+from typing import Callable
+
+def percentile(samples: list[float], p: float) -> float:
+    """
+    Returns the p-th percentile (0-100) of samples, by the nearest-rank method.
+    """
+
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+
+def measure(label: str, fn: Callable, repeats: int = 3, width: int = 28, before: Callable | None = None,
+            details: Callable[[], str] | None = None) -> tuple:
+    """
+    Calls fn repeats times and prints its best wall time, labelled.
+
+    Args:
+        label (str): Printed before the time, padded to width.
+        fn (Callable): Function timed, called without arguments.
+        repeats (int): Number of calls. The best time is reported, as the least disturbed by the rest of the system.
+        width (int): Width label is padded to, so a benchmark's lines align.
+        before (Callable | None): Called untimed before every call, e.g. to reset a counter.
+        details (Callable[[], str] | None): Called after the last call, its text printed after the time.
+
+    Returns:
+        tuple: fn's last result and its best time in seconds.
+    """
+
+    best = None
+    for _ in range(repeats):
+        if before:
+            before()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"{label:<{width}} {best * 1000:9.1f} ms" + (f"   {details()}" if details else ""))
+    return result, best
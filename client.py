@@ -0,0 +1,66 @@
+"""
+Client side of the server mode (see server.py), used by `main.py` to hand a command to a running server. It speaks
+just enough HTTP over a plain socket that forwarding a command doesn't import http.client or http.server, which
+would cost more startup time than the server saves.
+"""
+import json
+import os
+import socket
+
+from constants import DB_NAME, SERVER_HOST, SERVER_PORT
+
+# Seconds to wait for the server's answer, e.g. while it finishes a `rebuild` queued ahead of the command
+FORWARD_TIMEOUT = 30
+
+def forward(cmd: str, args: list, host: str = SERVER_HOST, port: int = SERVER_PORT,
+            timeout: float = FORWARD_TIMEOUT) -> str | None:
+    """
+    Sends a command to a running server.
+
+    Only a command the server never received (no server is running, or it turned the command down) should be run
+    by the caller instead. Once the request has gone out the server may run it whatever happens to the answer, so a
+    lost answer is reported as an error rather than the command being run a second time.
+
+    Returns:
+        str: The command's output, or an error message if the server took the command but no answer came back.
+        None: If no server is running for this database, or it doesn't serve this command, in which case the
+              caller should run the command itself.
+    """
+
+    body = json.dumps({"cmd": cmd, "args": args, "db": os.path.abspath(DB_NAME)}).encode()
+    request = (
+        f"POST / HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n"
+    ).encode() + body
+
+    try:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    except OSError:
+        return None
+
+    with sock:
+        try:
+            sock.sendall(request)
+
+            # The server closes the connection after answering, so the response is everything up to EOF
+            chunks = []
+            while chunk := sock.recv(65536):
+                chunks.append(chunk)
+        except OSError as e:
+            return f"Error: no answer from the server ({e}). It may still run '{cmd}', so it wasn't run here.\n"
+
+    head, _, output = b"".join(chunks).partition(b"\r\n\r\n")
+    status_line = head.split(b"\r\n", 1)[0].split(b" ")
+    status = status_line[1] if len(status_line) > 1 else b""
+
+    if status == b"200":
+        return output.decode()
+
+    # Wrong database (409) or a command the server doesn't serve (404): nothing ran there
+    if status in (b"404", b"409"):
+        return None
+
+    return f"Error: the server failed to run '{cmd}' and may have run it partly. Check its output before retrying.\n"
@@ -5,6 +5,10 @@ LEETCODE_GRAPHQL_URL = "https://leetcode.com/graphql"
 # Name of database storing problems and attempts tables
 DB_NAME = "leetcode.db"
 
+# Name of the user whose attempts and reviews commands act on when no `--user` is given. Databases created
+# before multi-user support have all their attempts and reviews assigned to this user
+DEFAULT_USER = "default"
+
 # Mathematical constant to calculate retention decay
 RETENTION_DECAY = 7
 
@@ -29,5 +33,102 @@ MIN_ATTEMPT_RECC_THRESHOLD = 1
 # Number of topics to be recommended at a time.
 NUM_RECC = 3
 
+# Number of problems recommended per recommended topic.
+NUM_RECC_PROBLEMS = 3
+
+# Days since a solved problem's last attempt after which it is recommended again for a refresher.
+RECC_STALE_DAYS = 30
+
+# Difficulty of the problems recommended for a topic, by the user's mastery of it: the first difficulty whose
+# max. mastery (key) is above the topic's score. Problems of other difficulties are recommended after these.
+RECC_DIFFICULTY_BY_MASTERY = {0.5: "Easy", 0.75: "Medium", 1.0: "Hard"}
+
 # Days until review (val), for each confidence level (key). Note that failed attempt means revising tomorrow
-CONF_REVIEW_DAYS = {1: 2, 2: 2, 3: 5, 4: 7, 5: 10 }
\ No newline at end of file
+CONF_REVIEW_DAYS = {1: 2, 2: 2, 3: 5, 4: 7, 5: 10 }
+
+# SM-2 spaced repetition, applied from a problem's second successful attempt onwards (the first uses
+# CONF_REVIEW_DAYS): each interval is the previous one times the problem's ease, which starts at SM2_INITIAL_EASE
+# and moves with the quality of every attempt. Quality is SM2_QUALITY[confidence] for a success and
+# SM2_FAIL_QUALITY for a failure, which restarts the problem at a 1 day interval
+SM2_INITIAL_EASE = 2.5
+SM2_MIN_EASE = 1.3
+SM2_MAX_INTERVAL = 365
+SM2_QUALITY = {1: 3, 2: 3, 3: 4, 4: 4, 5: 5}
+SM2_FAIL_QUALITY = 1
+
+# Max. number of reviews a user is given per day (attempts already logged today count towards it)
+REVIEW_DAILY_CAPACITY = 20
+
+# Review priority is measured in days overdue. On top of the real days overdue, a review is moved up by
+# REVIEW_PRIORITY_CONF_DAYS for each point of confidence below 5 in its last attempt (REVIEW_PRIORITY_FAIL_DAYS if
+# it failed), and by up to REVIEW_PRIORITY_MASTERY_DAYS the weaker the user's mastery of its weakest topic is
+REVIEW_PRIORITY_CONF_DAYS = 1
+REVIEW_PRIORITY_FAIL_DAYS = 7
+REVIEW_PRIORITY_MASTERY_DAYS = 7
+
+# SQLite storage profile applied to every new database connection, chosen from STORAGE_PROFILES below
+STORAGE_PROFILE = "wal"
+
+# PRAGMA name -> value for each storage profile.
+# "wal" lets `stats` readers run while `log` is writing, and only fsyncs at checkpoints instead of every commit.
+# "default" is SQLite's out-of-the-box rollback journal with a full fsync per commit.
+STORAGE_PROFILES = {
+    "default": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024, # Bytes of the database file to memory-map
+        "cache_size": -64 * 1024, # Negative values are in KiB, so 64 MiB of page cache
+        "temp_store": "MEMORY"
+    }
+}
+
+# Number of committed write transactions (per connection) between WAL checkpoints and PRAGMA optimize runs
+STORAGE_MAINTENANCE_INTERVAL = 500
+
+# Number of attempts inserted per transaction by the `import` command
+IMPORT_CHUNK_SIZE = 5000
+
+# LeetCode API request settings. Timeout is in seconds
+API_TIMEOUT = 10
+
+# Max. number of API requests in flight at once when fetching many problems
+API_MAX_WORKERS = 8
+
+# Number of problems requested per GraphQL request (each one is an aliased question field)
+API_BATCH_SIZE = 20
+
+# Retries for rate limited (429) or failed (5xx) requests, waiting API_BACKOFF_SECONDS * 2^retry between them
+API_MAX_RETRIES = 3
+API_BACKOFF_SECONDS = 0.5
+
+# Default path of the offline problem catalog snapshot (gzip-compressed JSON lines)
+CATALOG_FILE = "catalog.jsonl.gz"
+
+# How long (in seconds) a failed problem lookup is remembered before LeetCode is asked again.
+# Unknown slugs are a permanent answer, failed requests (rate limits, timeouts) are usually transient
+LOOKUP_NOT_FOUND_TTL = 7 * 24 * 60 * 60
+LOOKUP_FAILED_TTL = 5 * 60
+
+# Age (in seconds) after which cached problem metadata is re-checked by the `refresh` command
+PROBLEM_REFRESH_TTL = 30 * 24 * 60 * 60
+
+# Number of review rows fetched from the database at a time when listing reviews
+REVIEW_FETCH_SIZE = 500
+
+# Number of attempt rows fetched from the database at a time when streaming attempts (e.g. for `stats`)
+ATTEMPT_FETCH_SIZE = 1000
+
+# Max. number of analytics results (mastery scores, reports, recommendations) cached in memory by each process,
+# and in the database across processes (see analytics/cache.py). Any write to the data invalidates them
+ANALYTICS_CACHE_SIZE = 128
+ANALYTICS_CACHE_DISK_SIZE = 1024
+
+# Worker processes generating reports in parallel for `report-all` (None for one per CPU), and number of users
+# handed to a worker at a time
+REPORT_WORKERS = None
+REPORT_CHUNK_SIZE = 20
+
+# Address of the optional background server (`python main.py serve`). Commands are forwarded to it when it runs
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
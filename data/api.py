@@ -1,14 +1,163 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from typing import TYPE_CHECKING
 
-from constants import LEETCODE_GRAPHQL_URL
+from constants import (
+    LEETCODE_GRAPHQL_URL, API_TIMEOUT,
+    API_MAX_WORKERS, API_BATCH_SIZE,
+    API_MAX_RETRIES, API_BACKOFF_SECONDS
+    )
+from profiling import timed, count
+
+if TYPE_CHECKING:
+    import requests
+
+QUESTION_FIELDS = """
+        questionFrontendId
+        title
+        difficulty
+        topicTags {
+          name
+        }
+"""
 
-def fetch_problem_from_api(slug: str) -> dict[str, int | str | list[str]] | None:
+# HTTP statuses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Outcomes of looking a problem up: found, definitely doesn't exist, or the request failed (worth retrying later)
+FOUND = "found"
+NOT_FOUND = "not_found"
+FAILED = "failed"
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> "requests.Session":
+    """
+    Returns the shared HTTP session, so TCP/TLS connections to LeetCode are pooled and reused across requests.
+    """
+    global _session
+
+    # requests is slow to import, so it is only loaded once a command actually needs the network
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update({
+                "Content-Type": "application/json",
+                "Referer": "https://leetcode.com"
+            })
+
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_MAX_WORKERS)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+
+    return _session
+
+
+def _post(payload: dict, url: str | None = None) -> dict | None:
+    """
+    POSTs a GraphQL payload, retrying with exponential backoff on rate limits, server errors and connection
+    failures.
+
+    Returns:
+        dict: The decoded JSON response.
+        None: If the request still fails after API_MAX_RETRIES retries, or the response isn't a JSON object (e.g.
+              a proxy's error page), in which case the lookups it was for count as failed.
+    """
+
+    import requests
+
+    for retry in range(API_MAX_RETRIES + 1):
+        delay = API_BACKOFF_SECONDS * 2 ** retry
+
+        count("api.requests")
+        try:
+            response = get_session().post(url or LEETCODE_GRAPHQL_URL, json=payload, timeout=API_TIMEOUT)
+        except requests.RequestException:
+            response = None
+
+        if response is not None:
+            if response.status_code == 200:
+                try:
+                    data = response.json()
+                except ValueError:
+                    return None
+                return data if isinstance(data, dict) else None
+
+            if response.status_code not in RETRY_STATUSES:
+                return None
+
+            # Rate limited responses may say how long to wait
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = int(retry_after)
+
+        if retry < API_MAX_RETRIES:
+            time.sleep(delay)
+
+    return None
+
+
+def _parse_question(q: dict | None) -> dict[str, int | str | list[str]] | None:
+    # If null LeetCode problem
+    if q is None:
+        return None
+
+    return {
+        "id": int(q["questionFrontendId"]),
+        "title": q["title"],
+        "difficulty": q["difficulty"],
+        "topics": [t["name"] for t in q["topicTags"]]
+    }
+
+
+def lookup_problem(slug: str, url: str | None = None) -> tuple[str, dict[str, int | str | list[str]] | None]:
+    """
+    Fetch LeetCode problem metadata, reporting why the problem couldn't be fetched if it wasn't.
+
+    Args:
+        slug (text): The problem's title slug.
+            Ex. "two-sum"
+        url (str | None): GraphQL endpoint to query. Defaults to LEETCODE_GRAPHQL_URL.
+
+    Returns:
+        tuple: (FOUND, metadata dict as returned by fetch_problem_from_api) if the problem is found.
+               (NOT_FOUND, None) if LeetCode has no problem with this slug.
+               (FAILED, None) if the API call failed, e.g. rate limited or offline.
+    """
+
+    query = f"""
+    query getQuestion($titleSlug: String!) {{
+      question(titleSlug: $titleSlug) {{{QUESTION_FIELDS}      }}
+    }}
+    """
+
+    variables = {"titleSlug": slug}
+
+    data = _post({"query": query, "variables": variables}, url)
+
+    # Response didn't work properly, or error in data fetching. Unknown slugs come back as a null question
+    # (possibly alongside "errors"), so only a missing data object counts as a failure
+    if data is None or not data.get("data"):
+        return FAILED, None
+
+    problem = _parse_question(data["data"]["question"])
+
+    return (FOUND, problem) if problem else (NOT_FOUND, None)
+
+
+def fetch_problem_from_api(slug: str, url: str | None = None) -> dict[str, int | str | list[str]] | None:
     """
     Fetch LeetCode problem metadata from GraphQL endpoint user problem's slug.
     
     Args:
         slug (text): The problem's title slug.
             Ex. "two-sum"
+        url (str | None): GraphQL endpoint to query. Defaults to LEETCODE_GRAPHQL_URL.
     
     Returns:
         dict: Dictionary {"id": int, "title": str, "difficulty": str, "topics": list[str]} if the problem is found.
@@ -21,50 +170,149 @@ def fetch_problem_from_api(slug: str) -> dict[str, int | str | list[str]] | None
         None: If the problem does not exist or the API call fails in any way.
     """
 
-    query = """
-    query getQuestion($titleSlug: String!) {
-      question(titleSlug: $titleSlug) {
-        questionFrontendId
-        title
-        difficulty
-        topicTags {
-          name
-        }
-      }
-    }
-    """
+    return lookup_problem(slug, url)[1]
 
-    variables = {"titleSlug": slug}
 
-    response = requests.post(
-        LEETCODE_GRAPHQL_URL,
-        json={"query": query, "variables": variables},
-        headers={
-            "Content-Type": "application/json",
-            "Referer": "https://leetcode.com"
-        },
-        timeout=10
+def _fetch_batch(slugs: list[str], url: str | None) -> dict[str, tuple[str, dict | None]]:
+    """
+    Looks up several problems in one GraphQL request, with one aliased question field per slug.
+    """
+
+    params = ", ".join(f"$s{i}: String!" for i in range(len(slugs)))
+    fields = "".join(
+        f"""
+      q{i}: question(titleSlug: $s{i}) {{{QUESTION_FIELDS}      }}"""
+        for i in range(len(slugs))
     )
+    query = f"""
+    query getQuestions({params}) {{{fields}
+    }}
+    """
 
-    # Response didn't work properly
-    if response.status_code != 200:
-        return None
-    
-    data = response.json()
+    variables = {f"s{i}": slug for i, slug in enumerate(slugs)}
+
+    data = _post({"query": query, "variables": variables}, url)
+
+    # Unknown slugs come back as null fields (possibly alongside "errors"), so only a missing data object
+    # fails the whole batch
+    if data is None or not data.get("data"):
+        return {slug: (FAILED, None) for slug in slugs}
+
+    results = {}
+    for i, slug in enumerate(slugs):
+        problem = _parse_question(data["data"].get(f"q{i}"))
+        results[slug] = (FOUND, problem) if problem else (NOT_FOUND, None)
+
+    return results
+
+
+@timed()
+def lookup_problems(slugs: list[str], max_workers: int = API_MAX_WORKERS,
+                    batch_size: int = API_BATCH_SIZE, url: str | None = None) -> dict[str, tuple[str, dict | None]]:
+    """
+    Look up many problems at once: slugs are grouped batch_size to a GraphQL request, and up to max_workers
+    requests run concurrently over the shared session.
+
+    Args:
+        slugs (list[str]): The problems' title slugs.
+        max_workers (int): Max. number of requests in flight at once.
+        batch_size (int): Number of problems per request.
+        url (str | None): GraphQL endpoint to query. Defaults to LEETCODE_GRAPHQL_URL.
+
+    Returns:
+        dict[str, tuple[str, dict | None]]: Mapping slug -> (status, metadata), as returned by lookup_problem.
+    """
+
+    slugs = list(dict.fromkeys(slugs))
+    batches = [slugs[i:i + batch_size] for i in range(0, len(slugs), batch_size)]
+
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for batch in pool.map(lambda batch: _fetch_batch(batch, url), batches):
+            results.update(batch)
+
+    return results
+
+
+def fetch_problems_from_api(slugs: list[str], max_workers: int = API_MAX_WORKERS,
+                            batch_size: int = API_BATCH_SIZE, url: str | None = None) -> dict[str, dict | None]:
+    """
+    Fetch metadata for many problems at once, concurrently and in batches (see lookup_problems).
+
+    Returns:
+        dict[str, dict | None]: Mapping slug -> metadata in the same form as fetch_problem_from_api, or None if
+                                that problem could not be fetched.
+    """
+
+    results = lookup_problems(slugs, max_workers, batch_size, url)
+
+    return {slug: problem for slug, (_, problem) in results.items()}
 
-    # Error in data fetching
-    if "errors" in data:
+
+def fetch_problem_list(skip: int, limit: int, url: str | None = None) -> tuple[int, list[dict]] | None:
+    """
+    Fetch one page of LeetCode's full problem list.
+
+    Args:
+        skip (int): Number of problems to skip, in problem list order.
+        limit (int): Max. number of problems on the page.
+        url (str | None): GraphQL endpoint to query. Defaults to LEETCODE_GRAPHQL_URL.
+
+    Returns:
+        tuple[int, list[dict]]: Total number of problems, and the page's problems in the same form as
+                                fetch_problem_from_api plus a "slug" key.
+        None: If the API call fails in any way.
+    """
+
+    query = f"""
+    query problemsetQuestionList($categorySlug: String, $limit: Int, $skip: Int, $filters: QuestionListFilterInput) {{
+      problemsetQuestionList: questionList(categorySlug: $categorySlug, limit: $limit, skip: $skip, filters: $filters) {{
+        total: totalNum
+        questions: data {{
+          titleSlug{QUESTION_FIELDS}        }}
+      }}
+    }}
+    """
+
+    variables = {"categorySlug": "", "skip": skip, "limit": limit, "filters": {}}
+
+    data = _post({"query": query, "variables": variables}, url)
+
+    if data is None or "errors" in data:
         return None
-    
-    q = data["data"]["question"]
 
-    # If null LeetCode problem
-    if q is None:
+    page = data["data"]["problemsetQuestionList"]
+
+    return page["total"], [
+        {"slug": q["titleSlug"], **_parse_question(q)}
+        for q in page["questions"]
+    ]
+
+
+@timed()
+def fetch_all_problems(page_size: int = 100, max_workers: int = API_MAX_WORKERS,
+                       url: str | None = None) -> list[dict] | None:
+    """
+    Fetch every problem on LeetCode, requesting the pages after the first one concurrently.
+
+    Returns:
+        list[dict]: Every problem, in the same form as fetch_problem_list's pages.
+        None: If any page could not be fetched.
+    """
+
+    first = fetch_problem_list(0, page_size, url)
+    if first is None:
         return None
-    
-    return {
-        "id": int(q["questionFrontendId"]),
-        "title": q["title"],
-        "difficulty": q["difficulty"],
-        "topics": [t["name"] for t in q["topicTags"]]
-    }
+
+    total, problems = first
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pages = pool.map(lambda skip: fetch_problem_list(skip, page_size, url), range(page_size, total, page_size))
+
+        for page in pages:
+            if page is None:
+                return None
+            problems.extend(page[1])
+
+    return problems
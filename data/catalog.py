@@ -0,0 +1,193 @@
+import gzip
+import json
+from typing import Iterable, Iterator
+
+from .database import connection, transaction, link_topics
+from .api import fetch_all_problems, lookup_problems, FOUND
+from .lookup_cache import record_lookups, stale_slugs
+from .topic_mastery import rebuild_topic_mastery
+
+from constants import CATALOG_FILE, PROBLEM_REFRESH_TTL
+from profiling import timed
+
+def write_catalog(problems: Iterable[dict], path: str = CATALOG_FILE) -> int:
+    """
+    Writes problems to a catalog file: gzip-compressed JSON lines, one problem per line with the keys
+    "id", "slug", "title", "difficulty" and "topics". Lines are sorted by id, so snapshots diff cleanly.
+
+    Returns:
+        int: Number of problems written.
+    """
+
+    problems = sorted(problems, key=lambda p: p["id"])
+
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for problem in problems:
+            record = {key: problem[key] for key in ("id", "slug", "title", "difficulty", "topics")}
+            f.write(json.dumps(record) + "\n")
+
+    return len(problems)
+
+
+def read_catalog(path: str = CATALOG_FILE) -> Iterator[dict]:
+    """
+    Streams the problems in a catalog file written by write_catalog.
+    """
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def export_catalog(path: str = CATALOG_FILE) -> int:
+    """
+    Writes every problem in the local database to a catalog file, e.g. to seed another machine.
+
+    Returns:
+        int: Number of problems written.
+    """
+
+    cur = connection().execute("SELECT id, slug, title, difficulty, topics FROM problems")
+
+    problems = (
+        {"id": row[0], "slug": row[1], "title": row[2], "difficulty": row[3], "topics": row[4].split(",") if row[4] else []}
+        for row in cur
+    )
+
+    return write_catalog(problems, path)
+
+
+def _apply_problems(conn, problems: Iterable[dict]) -> dict[str, int]:
+    """
+    Diffs problems against the problems table by id and writes only the new and changed ones, on the caller's
+    connection and transaction. A problem whose slug belongs to another id (locally, or earlier in problems) is
+    skipped and counted as a conflict, as slugs are unique.
+
+    Returns:
+        dict[str, int]: Counts of problems by outcome.
+                        Ex. {"added": 12, "updated": 1, "unchanged": 3000, "conflicts": 0}
+    """
+
+    counts = {"added": 0, "updated": 0, "unchanged": 0, "conflicts": 0}
+    cur = conn.cursor()
+
+    cur.execute("SELECT id, slug, title, difficulty, topics FROM problems")
+    existing = {row[0]: row[1:] for row in cur.fetchall()}
+
+    # Slug -> id of the problem holding it, as of the problems accepted so far
+    slug_ids = {row[0]: problem_id for problem_id, row in existing.items()}
+
+    added = []
+    updated = []
+
+    for problem in problems:
+        row = (problem["slug"], problem["title"], problem["difficulty"], ",".join(problem["topics"]))
+        current = existing.get(problem["id"])
+
+        if current == row:
+            counts["unchanged"] += 1
+            continue
+
+        if slug_ids.get(row[0], problem["id"]) != problem["id"]:
+            counts["conflicts"] += 1
+            continue
+
+        if current is None:
+            added.append((problem["id"], *row, problem["topics"]))
+        else:
+            updated.append((problem["id"], *row, problem["topics"]))
+            slug_ids.pop(current[0], None)
+
+        existing[problem["id"]] = row
+        slug_ids[row[0]] = problem["id"]
+
+    # Updates go first, as a renamed problem may free the slug of a new one
+    cur.executemany(
+        "UPDATE problems SET slug = ?, title = ?, difficulty = ?, topics = ? WHERE id = ?",
+        [(*problem[1:5], problem[0]) for problem in updated]
+    )
+    cur.executemany(
+        "INSERT INTO problems(id,slug,title,difficulty,topics) VALUES(?,?,?,?,?)",
+        [problem[:5] for problem in added]
+    )
+    cur.executemany("DELETE FROM problem_topics WHERE problem_id = ?", [(problem[0],) for problem in updated])
+
+    for problem in added + updated:
+        link_topics(cur, problem[0], problem[5])
+
+    # Changed topics or difficulties alter the mastery sums of attempts already logged
+    if updated:
+        rebuild_topic_mastery(conn)
+
+    counts["added"] = len(added)
+    counts["updated"] = len(updated)
+
+    return counts
+
+
+@timed()
+def load_catalog(path: str = CATALOG_FILE) -> dict[str, int]:
+    """
+    Loads a catalog file into the problems table in one transaction, so slugs resolve locally afterwards.
+
+    The load is incremental: problems are diffed against the local database by id, so new problems are
+    inserted, problems whose slug, title, difficulty or topics changed are updated, and the rest are skipped.
+    Problems whose slug is held by another id are skipped too, and counted as conflicts.
+
+    Returns:
+        dict[str, int]: Counts of problems by outcome.
+                        Ex. {"added": 12, "updated": 1, "unchanged": 3000, "conflicts": 0}
+    """
+
+    with transaction() as conn:
+        return _apply_problems(conn, read_catalog(path))
+
+
+@timed()
+def refresh_stale_problems(max_age: float = PROBLEM_REFRESH_TTL) -> dict[str, int]:
+    """
+    Re-checks cached problems whose metadata hasn't been confirmed by LeetCode within max_age seconds, in
+    concurrent batches, and applies any changes.
+
+    Returns:
+        dict[str, int]: Counts of problems by outcome, as returned by load_catalog, plus "failed" for problems
+                        that couldn't be checked (they keep their cached metadata).
+    """
+
+    slugs = stale_slugs(connection().cursor(), max_age)
+    results = lookup_problems(slugs)
+
+    with transaction() as conn:
+        counts = _apply_problems(conn, [
+            {"slug": slug, **problem} for slug, (status, problem) in results.items() if status == FOUND
+        ])
+        record_lookups(conn.cursor(), {slug: status for slug, (status, _) in results.items()})
+
+    counts["failed"] = sum(status != FOUND for status, _ in results.values())
+
+    return counts
+
+
+@timed()
+def pull_catalog(path: str = CATALOG_FILE, url: str | None = None) -> dict[str, int] | None:
+    """
+    Downloads LeetCode's full problem list into a catalog file, then loads it (see load_catalog) and marks
+    every problem's metadata as freshly confirmed.
+
+    Returns:
+        dict[str, int]: Counts of problems by outcome, as returned by load_catalog.
+        None: If the problem list could not be fetched.
+    """
+
+    problems = fetch_all_problems(url=url)
+    if problems is None:
+        return None
+
+    write_catalog(problems, path)
+
+    with transaction() as conn:
+        counts = _apply_problems(conn, problems)
+        record_lookups(conn.cursor(), {problem["slug"]: FOUND for problem in problems})
+
+    return counts
@@ -1,16 +1,209 @@
+import atexit
+from contextlib import contextmanager
+import os
 import sqlite3
+import threading
+from urllib.parse import quote
 
-from constants import DB_NAME
+from constants import DB_NAME, STORAGE_PROFILE, STORAGE_PROFILES, STORAGE_MAINTENANCE_INTERVAL
+from profiling import timed, enabled as profiling_enabled
 
+# Each thread keeps one open connection to the database, reused by every data access call
+_local = threading.local()
+
+# Whether this process opens the database read-only, e.g. the `report-all` worker processes (see analytics.batch)
+READ_ONLY = False
+
+@timed()
 def get_conn():
-    conn = sqlite3.connect(DB_NAME)
+    """
+    Opens a new connection to the database. Most callers should use connection() instead, which reuses one.
+
+    Connections are in autocommit mode: reads need no transaction, and writes are grouped with transaction().
+    While READ_ONLY is set, connections are opened read-only and any write raises sqlite3.OperationalError.
+    """
+    database = DB_NAME
+    options = {}
+
+    if READ_ONLY:
+        database = f"file:{quote(os.path.abspath(DB_NAME))}?mode=ro"
+        options["uri"] = True
+
+    # Under --profile, statements are counted and timed (see profiling.TracedConnection)
+    if profiling_enabled():
+        from profiling import trace_sql, TracedConnection
+        conn = sqlite3.connect(database, isolation_level=None, factory=TracedConnection, **options)
+        conn.set_trace_callback(trace_sql)
+    else:
+        conn = sqlite3.connect(database, isolation_level=None, **options)
+
     conn.execute("PRAGMA foreign_keys = ON")
+
+    # Storage tuning (journal mode, sync level, mmap and cache sizes) from constants.py
+    for pragma, value in STORAGE_PROFILES[STORAGE_PROFILE].items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+
+    return conn
+
+def connection():
+    """
+    Returns this thread's shared database connection, opening it on first use.
+    """
+    conn = getattr(_local, "conn", None)
+
+    # DB_NAME can be repointed (e.g. by the benchmarks), in which case the old connection is dropped
+    if conn is None or _local.db_name != DB_NAME:
+        close_conn()
+        conn = _local.conn = get_conn()
+        _local.db_name = DB_NAME
+
     return conn
 
+def close_conn():
+    """
+    Closes this thread's shared connection, if one is open. If data was written through it, SQLite refreshes its
+    query planner statistics first; a read-only command skips that, as it could write (ANALYZE) or wait for
+    another process's write lock on its way out.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        if getattr(_local, "wrote", False) and not READ_ONLY:
+            conn.execute("PRAGMA optimize")
+        conn.close()
+        _local.conn = None
+        _local.wrote = False
+
+atexit.register(close_conn)
+
+def _maintain(conn):
+    """
+    Periodic upkeep after a commit: folds the WAL back into the database file so it doesn't grow without bound,
+    and refreshes planner statistics.
+    """
+    commits = getattr(_local, "commits", 0) + 1
+    _local.commits = commits
+
+    if commits % STORAGE_MAINTENANCE_INTERVAL == 0:
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        conn.execute("PRAGMA optimize")
+
+def generation(conn=None) -> int:
+    """
+    Returns the database's generation: a counter stored in the database and bumped by every committed data
+    transaction (see transaction()), by any process. Results derived from the data can be cached under it until
+    it changes, in memory (see server.py) or on disk, as it survives across processes (see analytics.cache).
+    """
+    if conn is None:
+        conn = connection()
+    return conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+@contextmanager
+def transaction(conn=None, data: bool = True, wait: bool = True):
+    """
+    Context manager grouping writes into one transaction, committed once when the outermost block exits and
+    rolled back if it raises. Nested transaction() blocks on the same connection join the outer transaction, so
+    a whole flow (e.g. log_attempt) commits once.
+
+    Args:
+        conn (sqlite3.Connection | None): Connection to run the transaction on. Defaults to connection().
+        data (bool): Whether the transaction writes data, bumping the database's generation() as it commits. False
+                     for writes of derived results (e.g. analytics.cache), which must not invalidate themselves.
+        wait (bool): Whether to wait (up to sqlite3's busy timeout) while another connection holds the write lock.
+                     If False, the lock is taken up front and sqlite3.OperationalError raised at once if it's held,
+                     for optional writes that a reader mustn't block on (e.g. analytics.cache).
+    """
+    if conn is None:
+        conn = connection()
+
+    if conn.in_transaction:
+        yield conn
+        return
+
+    busy_timeout = None
+    if not wait:
+        busy_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        conn.execute("PRAGMA busy_timeout = 0")
+
+    try:
+        conn.execute("BEGIN" if wait else "BEGIN IMMEDIATE")
+        try:
+            yield conn
+            if data:
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+            # Inside the try, so a commit that fails (e.g. busy without waiting) doesn't leave the transaction open
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        if busy_timeout is not None:
+            conn.execute(f"PRAGMA busy_timeout = {busy_timeout}")
+
+    if data:
+        _local.wrote = True
+
+    _maintain(conn)
+
+def _table_exists(cur, name: str) -> bool:
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cur.fetchone() is not None
+
+def _has_column(cur, table: str, column: str) -> bool:
+    cur.execute(f"PRAGMA table_xinfo({table})")
+    return any(row[1] == column for row in cur.fetchall())
+
+def link_topics(cur, problem_id: int, topics: list[str]):
+    """
+    Stores a problem's topics in the normalised topics / problem_topics tables.
+    """
+
+    names = [topic.strip() for topic in topics if topic.strip()]
+
+    cur.executemany("INSERT OR IGNORE INTO topics(name) VALUES (?)", [(name,) for name in names])
+    cur.executemany(
+        """
+        INSERT OR IGNORE INTO problem_topics(problem_id, topic_id)
+        SELECT ?, id FROM topics WHERE name = ?
+        """,
+        [(problem_id, name) for name in names]
+    )
+
+# Version of the schema created by _create_schema, stored in the database's PRAGMA user_version. Bump it whenever
+# the schema or its migrations change, so existing databases run them once
+SCHEMA_VERSION = 8
+
+@timed()
 def init_db():
-    conn = get_conn()
+    """
+    Creates or migrates the schema, unless the database is already at SCHEMA_VERSION (a single PRAGMA read).
+    """
+    conn = connection()
+
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    with transaction(conn):
+        _create_schema(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def _create_schema(conn):
+    from .days import EPOCH_DAY_SQL
+    from .users import DEFAULT_USER_ID
+    from constants import DEFAULT_USER
+
     cur = conn.cursor()
 
+    # Learners sharing this database. Attempts, reviews and mastery are kept per user, while the problems cache is
+    # shared by everyone
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users(
+        id INTEGER PRIMARY KEY,
+        name TEXT UNIQUE
+    )
+    """)
+
+    cur.execute("INSERT OR IGNORE INTO users(id, name) VALUES (?, ?)", (DEFAULT_USER_ID, DEFAULT_USER))
+
     # Problems table storing LeetCode problems metadata
     cur.execute("""
     CREATE TABLE IF NOT EXISTS problems(
@@ -22,29 +215,210 @@ def init_db():
     )
     """)
 
-    # Attempts table storing each problem attempt's metadata
-    cur.execute("""
+    # Attempts table storing each problem attempt's metadata. day is date as an epoch day (see data.days), computed
+    # by SQLite so writers only ever supply the text date
+    cur.execute(f"""
     CREATE TABLE IF NOT EXISTS attempts(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
         problem_id INTEGER,
         date TEXT,
         time_taken INTEGER,
         confidence INTEGER,
         success INTEGER,
+        day INTEGER GENERATED ALWAYS AS ({EPOCH_DAY_SQL.format("date")}) VIRTUAL,
+        FOREIGN KEY(user_id) REFERENCES users(id),
         FOREIGN KEY(problem_id) REFERENCES problems(id)
     )
     """)
 
-    # Reviews table storing problems that need to be reviewed (spaced repetition)
-    cur.execute("""
+    # Single-user databases gain the column in place, with their attempts assigned to the default user (id 1).
+    # SQLite can't add a REFERENCES column with a default, so only new databases enforce the user foreign key
+    if not _has_column(cur, "attempts", "user_id"):
+        cur.execute(f"ALTER TABLE attempts ADD COLUMN user_id INTEGER NOT NULL DEFAULT {DEFAULT_USER_ID}")
+
+    # Virtual columns are computed on read (and stored only in the indexes below), so adding one rewrites nothing
+    if not _has_column(cur, "attempts", "day"):
+        cur.execute(f"ALTER TABLE attempts ADD COLUMN day INTEGER GENERATED ALWAYS AS ({EPOCH_DAY_SQL.format('date')}) VIRTUAL")
+
+    # Single-user reviews were keyed by problem_id alone. The primary key can't be altered, so the table is rebuilt
+    if _table_exists(cur, "reviews") and not _has_column(cur, "reviews", "user_id"):
+        cur.execute("ALTER TABLE reviews RENAME TO reviews_single_user")
+
+    # Reviews table storing problems that need to be reviewed (spaced repetition), one pending review per user
+    # and problem. review_day is review_date as an epoch day. boost_days moves the review up the due queue (see
+    # scheduler.review_boost_days), so rank_day is the day it is ordered by
+    cur.execute(f"""
     CREATE TABLE IF NOT EXISTS reviews(
-    problem_id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    problem_id INTEGER,
     review_date TEXT,
+    boost_days INTEGER NOT NULL DEFAULT 0,
+    review_day INTEGER GENERATED ALWAYS AS ({EPOCH_DAY_SQL.format("review_date")}) VIRTUAL,
+    rank_day INTEGER GENERATED ALWAYS AS (review_day - boost_days) VIRTUAL,
+    PRIMARY KEY(user_id, problem_id),
+    FOREIGN KEY(user_id) REFERENCES users(id),
     FOREIGN KEY(problem_id) REFERENCES problems(id)
     )
     """)
 
+    if _table_exists(cur, "reviews_single_user"):
+        cur.execute(
+            "INSERT INTO reviews(user_id, problem_id, review_date) SELECT ?, problem_id, review_date FROM reviews_single_user",
+            (DEFAULT_USER_ID,)
+        )
+        cur.execute("DROP TABLE reviews_single_user")
+
+    if not _has_column(cur, "reviews", "review_day"):
+        cur.execute(
+            f"ALTER TABLE reviews ADD COLUMN review_day INTEGER GENERATED ALWAYS AS ({EPOCH_DAY_SQL.format('review_date')}) VIRTUAL"
+        )
+
+    if not _has_column(cur, "reviews", "boost_days"):
+        cur.execute("ALTER TABLE reviews ADD COLUMN boost_days INTEGER NOT NULL DEFAULT 0")
+        cur.execute("ALTER TABLE reviews ADD COLUMN rank_day INTEGER GENERATED ALWAYS AS (review_day - boost_days) VIRTUAL")
+
+    # Each user's SM-2 state per problem attempted (see scheduler.next_state), from which reviews are scheduled
+    has_review_states = _table_exists(cur, "review_states")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS review_states(
+    user_id INTEGER,
+    problem_id INTEGER,
+    ease REAL,
+    interval INTEGER,
+    repetitions INTEGER,
+    last_day INTEGER,
+    PRIMARY KEY(user_id, problem_id)
+    ) WITHOUT ROWID
+    """)
+
+    # Indexes for the date-ranged hot paths: due reviews, windowed analytics and per-problem attempt history.
+    # Every query is scoped to one user, so each index leads with user_id and a user's rows are one contiguous
+    # range. Dates are indexed by epoch day. The indexes they replace are dropped from existing databases
+    for index in ("idx_attempts_date", "idx_attempts_problem_date", "idx_attempts_user_problem_date",
+                  "idx_attempts_user_date", "idx_attempts_user_problem", "idx_reviews_user_date"):
+        cur.execute(f"DROP INDEX IF EXISTS {index}")
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reviews_user_day ON reviews(user_id, review_day, problem_id)")
+
+    # The due queue (see scheduler.next_reviews) walks a user's reviews in rank_day order. review_day is included so
+    # reviews that aren't due yet are skipped without reading the table
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reviews_user_rank ON reviews(user_id, rank_day, problem_id, review_day)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_attempts_user_day ON attempts(user_id, day)")
+
+    # Per-problem history. Also covers success, so a user's progress on every problem (see get_problem_progress) is
+    # read from the index alone
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_attempts_user_problem_day ON attempts(user_id, problem_id, day, success)")
+
+    # Outcome of the last LeetCode lookup of each slug: remembers failed lookups so they aren't retried until
+    # their TTL expires, and when cached metadata was last confirmed
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS slug_lookups(
+    slug TEXT PRIMARY KEY,
+    status TEXT,
+    checked_at REAL
+    )
+    """)
+
+    # Database-wide counters, e.g. the generation bumped by every data transaction (see generation())
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS meta(
+    key TEXT PRIMARY KEY,
+    value INTEGER
+    ) WITHOUT ROWID
+    """)
+    cur.execute("INSERT OR IGNORE INTO meta(key, value) VALUES ('generation', 0)")
+
+    # Analytics results (as JSON) cached across processes by analytics.cache, valid while the database is still at
+    # the generation they were computed at
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS analytics_cache(
+    key TEXT PRIMARY KEY,
+    generation INTEGER,
+    value BLOB,
+    stored_at REAL
+    )
+    """)
+
+    # Normalised topic storage, so topics can be filtered and grouped on in SQL
+    has_problem_topics = _table_exists(cur, "problem_topics")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS topics(
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE
+    )
+    """)
+
+    # The primary key doubles as the (problem_id) index
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS problem_topics(
+    problem_id INTEGER,
+    topic_id INTEGER,
+    PRIMARY KEY(problem_id, topic_id),
+    FOREIGN KEY(problem_id) REFERENCES problems(id),
+    FOREIGN KEY(topic_id) REFERENCES topics(id)
+    ) WITHOUT ROWID
+    """)
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_problem_topics_topic ON problem_topics(topic_id, problem_id)")
+
+    # Existing databases only have the comma-joined problems.topics column, so it is split once here
+    if not has_problem_topics:
+        cur.execute("SELECT id, topics FROM problems")
+        for problem_id, topics in cur.fetchall():
+            link_topics(cur, problem_id, (topics or "").split(","))
+
+    # Daily per-user, per-topic running sums of attempts, maintained by log_attempt. Mastery reads these buckets
+    # instead of re-scanning every attempt
+    has_topic_mastery = _table_exists(cur, "topic_mastery")
+
+    # Buckets are derived data, so older layouts (single-user, keyed by text date, or without time sums) are
+    # dropped and rebuilt below
+    if has_topic_mastery and not _has_column(cur, "topic_mastery", "time_sum"):
+        cur.execute("DROP TABLE topic_mastery")
+        has_topic_mastery = False
+
+    # day is the bucket's date as an epoch day
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS topic_mastery(
+    user_id INTEGER,
+    day INTEGER,
+    topic TEXT,
+    attempts INTEGER,
+    success_sum INTEGER,
+    conf_sum INTEGER,
+    speed_sum REAL,
+    time_sum INTEGER,
+    PRIMARY KEY(user_id, day, topic)
+    ) WITHOUT ROWID
+    """)
+
+    # The same daily sums per difficulty, for progress over time by difficulty (see analytics.progress)
+    has_difficulty_mastery = _table_exists(cur, "difficulty_mastery")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS difficulty_mastery(
+    user_id INTEGER,
+    day INTEGER,
+    difficulty TEXT,
+    attempts INTEGER,
+    success_sum INTEGER,
+    conf_sum INTEGER,
+    speed_sum REAL,
+    time_sum INTEGER,
+    PRIMARY KEY(user_id, day, difficulty)
+    ) WITHOUT ROWID
+    """)
+
+    # Existing databases get their buckets filled from the attempts already logged
+    if not has_topic_mastery or not has_difficulty_mastery:
+        from .topic_mastery import rebuild_topic_mastery
+        rebuild_topic_mastery(conn)
 
-    
-    conn.commit()
-    conn.close()
+    # Existing databases get their review states replayed from the attempts already logged, which reschedules
+    # their reviews from each problem's history (boost_days included) rather than its last attempt alone
+    if not has_review_states:
+        from .scheduler import replay_review_states
+        replay_review_states(conn)
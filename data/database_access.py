@@ -1,9 +1,30 @@
-from .database import get_conn
-from .api import fetch_problem_from_api
+from typing import Iterator, NamedTuple
+
+from .database import connection, transaction, link_topics
+from .api import lookup_problems, FOUND
+from .lookup_cache import lookup_stats, remembered_failures, record_lookups
 from .scheduler import schedule_review
+from .topic_mastery import record_attempt
+from .days import to_day, is_date
+from .users import DEFAULT_USER_ID
+
+from constants import ATTEMPT_FETCH_SIZE
+from profiling import timed
+
+class AttemptRow(NamedTuple):
+    """
+    A logged attempt together with its problem's details. Unpacks like the tuples returned by get_attempts.
+    """
+    slug: str
+    difficulty: str
+    topics: str
+    date: str
+    time_taken: int
+    confidence: int
+    success: int
 
 # TODO: Maybe edit this function to get only slug, and call from API. This way, there's validation + less user work
-def add_problem(problem_id: int, slug: str, title: str, difficulty: str, topics: list[str]):
+def add_problem(problem_id: int, slug: str, title: str, difficulty: str, topics: list[str], conn=None):
     """
     Add a LeetCode problem to the problems database.
     
@@ -18,21 +39,23 @@ def add_problem(problem_id: int, slug: str, title: str, difficulty: str, topics:
             Ex. "Easy"
         topics (list[str]): List of problem's topics as strings.
             Ex. ["Junior", "Array", "Hash Table"]
+        conn (sqlite3.Connection | None): Connection to write on, joining its transaction if one is open.
     """
-    conn = get_conn()
-    cur = conn.cursor()
+    with transaction(conn) as conn:
+        cur = conn.cursor()
 
-    # Convert topics list to comma-separated string for storage
-    topics_str = ",".join(topics)
-    
-    # Inserting problem into problem database using problem_id as id
-    cur.execute(
-        "INSERT OR IGNORE INTO problems(id,slug,title,difficulty,topics) VALUES(?,?,?,?,?)",
-        (problem_id, slug, title, difficulty, topics_str)
-    )
+        # Convert topics list to comma-separated string for storage
+        topics_str = ",".join(topics)
+        
+        # Inserting problem into problem database using problem_id as id
+        cur.execute(
+            "INSERT OR IGNORE INTO problems(id,slug,title,difficulty,topics) VALUES(?,?,?,?,?)",
+            (problem_id, slug, title, difficulty, topics_str)
+        )
 
-    conn.commit()
-    conn.close()
+        # Topics are also stored normalised, so they can be queried without splitting topics_str
+        if cur.rowcount:
+            link_topics(cur, problem_id, topics)
 
 def get_problem_by_slug(slug: str):
     """
@@ -49,56 +72,112 @@ def get_problem_by_slug(slug: str):
         None: If the problem does not exist in the local database.
     """
 
-    conn = get_conn()
-    cur = conn.cursor()
+    cur = connection().cursor()
 
     cur.execute(
         "SELECT id, title, difficulty, topics FROM problems WHERE slug = ?",
         (slug,)
     )
     
-    row = cur.fetchone()
-    conn.close()
-    
-    return row
+    return cur.fetchone()
 
 def get_or_create_problem(slug: str) -> int | None:
     """
     Returns problem_id. Fetches from API and inserts into problems database if missing.
 
+    Slugs whose lookup recently failed aren't fetched again until their entry in slug_lookups expires
+    (see get_or_create_problems).
+
     Returns:
         None: If problem cannot be found.
     """
 
-    row = get_problem_by_slug(slug)
+    return get_or_create_problems([slug])[slug]
+
+@timed()
+def get_or_create_problems(slugs: list[str]) -> dict[str, int | None]:
+    """
+    Bulk version of get_or_create_problem. Cached slugs are looked up in one query, and the rest are fetched
+    from the API concurrently in batches and inserted in one transaction.
+
+    Failed lookups are remembered in slug_lookups: unknown slugs for LOOKUP_NOT_FOUND_TTL and failed requests
+    for LOOKUP_FAILED_TTL seconds, during which they resolve to None without a network call.
+
+    Returns:
+        dict[str, int | None]: Mapping slug -> problem_id, or None if that problem cannot be found.
+    """
+
+    slugs = list(dict.fromkeys(slugs))
+    if not slugs:
+        return {}
+
+    cur = connection().cursor()
+
+    placeholders = ",".join("?" * len(slugs))
+    cur.execute(f"SELECT slug, id FROM problems WHERE slug IN ({placeholders})", slugs)
+    problem_ids = dict(cur.fetchall())
+    lookup_stats["hit"] += len(problem_ids)
 
-    if row:
-        return row[0]
+    missing = [slug for slug in slugs if slug not in problem_ids]
+    if not missing:
+        return problem_ids
+
+    # Known-bad slugs are answered from the negative cache
+    failures = remembered_failures(cur, missing)
+    lookup_stats["negative_hit"] += len(failures)
+    for slug in failures:
+        problem_ids[slug] = None
+
+    to_fetch = [slug for slug in missing if slug not in failures]
+    if not to_fetch:
+        return problem_ids
 
     # Not cached, fetch from API
-    data = fetch_problem_from_api(slug)
-    if not data:
-        return None
+    lookup_stats["miss"] += len(to_fetch)
+    results = lookup_problems(to_fetch)
+
+    with transaction() as conn:
+        for slug, (status, data) in results.items():
+            if status == FOUND:
+                add_problem(data["id"], slug, data["title"], data["difficulty"], data["topics"], conn)
+                problem_ids[slug] = data["id"]
+            else:
+                problem_ids[slug] = None
 
-    problem_id = data.get("id")
-    title = data.get("title")
-    difficulty = data.get("difficulty")
-    topics = data.get("topics")
+        record_lookups(conn.cursor(), {slug: status for slug, (status, _) in results.items()})
 
-    if None in (problem_id, title, difficulty, topics):
-        return None
+    return problem_ids
 
-    add_problem(problem_id, slug, title, difficulty, topics)
+def validate_attempt(slug: str, time_taken: int, confidence: int, success: int, date: str | None = None) -> str | None:
+    """
+    Checks an attempt's fields before it is logged or imported. The date is only checked if given.
 
-    return problem_id
+    Returns:
+        str: Error message describing the first invalid field.
+        None: If the attempt is valid.
+    """
+    if not slug or not isinstance(slug, str):
+        return "Invalid slug. Input a string."
+    if not (1 <= confidence <= 5):
+        return "Confidence must be between 1 and 5, inclusive."
+    if time_taken < 0:
+        return "Time taken cannot be negative."
+    if success not in (0, 1):
+        return "Success must either be 0 (Fail) or 1 (Pass)."
+    if date is not None and not is_date(date):
+        return "Invalid date. Use the YYYY-MM-DD format."
+    return None
 
-def log_attempt(slug: str, date: str, time_taken: int, confidence: int, success: int):
+@timed()
+def log_attempt(slug: str, date: str, time_taken: int, confidence: int, success: int,
+                user_id: int = DEFAULT_USER_ID):
     """
-    Log a LeetCode attempt.
+    Log a user's LeetCode attempt.
 
     Flow:
     1. Ensure problem exists in local database (attempt fetch + cache if missing)
-    2. Insert attempt entry referencing slug
+    2. Insert attempt entry referencing slug, add it to the topic mastery buckets and schedule its review, in one
+       transaction
     3. Return result dictionary
     
     Args:
@@ -107,6 +186,7 @@ def log_attempt(slug: str, date: str, time_taken: int, confidence: int, success:
         time_taken (int): Time spent on the attempt (in minutes).
         confidence (int): User-rated confidence level (1-5).
         success (int): Whether attempt was successful (0|1).
+        user_id (int): Id of the user who made the attempt (see get_user_id).
     
     Returns:
         dict: Success response with attempt_id and slug if logged successfully.
@@ -115,14 +195,9 @@ def log_attempt(slug: str, date: str, time_taken: int, confidence: int, success:
               Example: {"success": False, "error": "Problem not found in database or LeetCode"}
     """
     # Validity checks
-    if not slug or not isinstance(slug, str):
-        return {"success": False, "error": "Invalid slug. Input a string."}
-    if not (1 <= confidence <= 5):
-        return {"success": False, "error": "Confidence must be between 1 and 5, inclusive."}
-    if time_taken < 0:
-        return {"success": False, "error": "Time taken cannot be negative."}
-    if success not in (0, 1):
-        return {"success": False, "error": "Success must either be 0 (Fail) or 1 (Pass)."}
+    error = validate_attempt(slug, time_taken, confidence, success, date)
+    if error:
+        return {"success": False, "error": error}
         
     # Attempting to get problem from local database
     problem_id = get_or_create_problem(slug)
@@ -133,21 +208,27 @@ def log_attempt(slug: str, date: str, time_taken: int, confidence: int, success:
             "error": f'Problem with slug "{slug}" not found in database or LeetCode.'
         }
 
-    # Found / successfully fetched and added problem. Inserting attempt record
+    # Found / successfully fetched and added problem. Inserting attempt record, its topic buckets and the
+    # review date, committed together as one transaction
     try:
-        conn = get_conn()
-        cur = conn.cursor()
+        with transaction() as conn:
+            cur = conn.cursor()
 
-        cur.execute(
-            """
-            INSERT INTO attempts(problem_id, date, time_taken, confidence, success)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (problem_id, date, time_taken, confidence, int(success))
-        )
+            cur.execute(
+                """
+                INSERT INTO attempts(user_id, problem_id, date, time_taken, confidence, success)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (user_id, problem_id, date, time_taken, confidence, int(success))
+            )
+
+            attempt_id = cur.lastrowid
 
-        attempt_id = cur.lastrowid
-        conn.commit()
+            # Keeping the topic mastery buckets in step with the attempts table
+            record_attempt(cur, user_id, problem_id, date, time_taken, confidence, int(success))
+
+            # Updating the problem's review state and its next review date, counted from the attempt's date
+            schedule_review(problem_id, confidence, success, conn, user_id, date)
 
     except Exception as e:
         return {
@@ -155,23 +236,100 @@ def log_attempt(slug: str, date: str, time_taken: int, confidence: int, success:
             "error": f"Database error: {str(e)}"
         }
 
-    finally:
-        conn.close()
-
-    # If attempt was successful, we also schedule a review date
-    schedule_review(problem_id, confidence, success)
-
     return {
         "success": True,
         "attempt_id": attempt_id
     }
 
-def get_attempts() -> list[tuple]:
+@timed()
+def iter_attempts(topic: str | None = None, since: str | None = None, until: str | None = None,
+                  difficulty: str | None = None, problem_id: int | None = None, user_id: int = DEFAULT_USER_ID,
+                  chunk_size: int = ATTEMPT_FETCH_SIZE) -> Iterator[AttemptRow]:
+    """
+    Streams a user's logged attempts with their associated problem metadata, from one joined query.
+
+    Rows are fetched chunk_size at a time, so memory use stays flat however long the history is. Callers that
+    only aggregate the attempts should consume this directly rather than get_attempts.
+
+    Args:
+        topic (str | None): If provided, only attempts at problems tagged with this topic are returned.
+            Ex. "Hash Table"
+        since (str | None): If provided, only attempts on or after this date (ISO format "YYYY-MM-DD") are returned.
+            Ex. "2026-01-01"
+        until (str | None): If provided, only attempts on or before this date (ISO format "YYYY-MM-DD") are returned.
+            Ex. "2026-01-31"
+        difficulty (str | None): If provided, only attempts at problems of this difficulty are returned.
+            Ex. "Medium"
+        problem_id (int | None): If provided, only attempts at this problem are returned.
+            Ex. 1
+        user_id (int): User whose attempts are returned.
+        chunk_size (int): Number of rows fetched from the database at a time.
+
+    Yields:
+        AttemptRow: (slug, difficulty, topics, date, time_taken, confidence, success)
     """
-    Retrieve all logged attempts with their associated problem metadata.
+
+    # Every filter is scoped to the user, so the user-keyed attempts indexes narrow the scan to their rows
+    conditions = ["a.user_id = ?"]
+    params = [user_id]
+
+    # Topic drill-down goes through the problem_topics index rather than matching on the topics string
+    if topic is not None:
+        conditions.append(
+            """a.problem_id IN (
+            SELECT pt.problem_id
+            FROM problem_topics pt
+            JOIN topics t ON t.id = pt.topic_id
+            WHERE t.name = ?
+        )"""
+        )
+        params.append(topic)
+
+    # Per-problem history uses the attempts(user_id, problem_id, day, success) index
+    if problem_id is not None:
+        conditions.append("a.problem_id = ?")
+        params.append(problem_id)
+
+    # Date windows are filtered in SQL on epoch days, using the attempts(user_id, day) index
+    if since is not None:
+        conditions.append("a.day >= ?")
+        params.append(to_day(since))
+
+    if until is not None:
+        conditions.append("a.day <= ?")
+        params.append(to_day(until))
+
+    if difficulty is not None:
+        conditions.append("p.difficulty = ?")
+        params.append(difficulty)
+
+    query = """
+        SELECT p.slug, p.difficulty, p.topics, a.date, a.time_taken, a.confidence, a.success
+        FROM attempts a
+        JOIN problems p ON a.problem_id = p.id
+        WHERE """ + " AND ".join(conditions)
+
+    cur = connection().cursor()
+    cur.execute(query, params)
+
+    while rows := cur.fetchmany(chunk_size):
+        for row in rows:
+            yield AttemptRow(*row)
+
+def get_attempts(topic: str | None = None, since: str | None = None, user_id: int = DEFAULT_USER_ID) -> list[tuple]:
+    """
+    Retrieve all of a user's logged attempts with their associated problem metadata, as a list. Prefer
+    iter_attempts (which takes the same filters and more) when the rows are only iterated over once.
     
     This joins the attempts table with the problems table to provide complete information about eachs attempt.
 
+    Args:
+        topic (str | None): If provided, only attempts at problems tagged with this topic are returned.
+            Ex. "Hash Table"
+        since (str | None): If provided, only attempts on or after this date (ISO format "YYYY-MM-DD") are returned.
+            Ex. "2026-01-01"
+        user_id (int): User whose attempts are returned.
+
     Returns:
          List of tuples, where each tuple contained an attempt metadata. Each tuple has:
             str: Title slug of problem.
@@ -190,19 +348,51 @@ def get_attempts() -> list[tuple]:
                 Ex. 1
     """
 
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    # Getting data from both problems and attempts tables
+    return list(iter_attempts(topic, since, user_id=user_id))
+
+@timed()
+def get_problems_by_topic() -> list[tuple]:
+    """
+    Returns every cached problem once per topic it's tagged with, for indexing problems by topic and difficulty.
+
+    Returns:
+        List of tuples (topic, difficulty, problem_id, slug, title).
+    """
+
+    cur = connection().cursor()
+
     cur.execute(
         """
-        SELECT p.slug, p.difficulty, p.topics, a.date, a.time_taken, a.confidence, a.success
-        FROM attempts a
-        JOIN problems p ON a.problem_id = p.id
+        SELECT t.name, p.difficulty, p.id, p.slug, p.title
+        FROM problem_topics pt
+        JOIN topics t ON t.id = pt.topic_id
+        JOIN problems p ON p.id = pt.problem_id
         """
     )
-    
-    attempts = cur.fetchall()
-    conn.close()
-    
-    return attempts
\ No newline at end of file
+
+    return cur.fetchall()
+
+@timed()
+def get_problem_progress(user_id: int = DEFAULT_USER_ID) -> dict[int, tuple[int, int]]:
+    """
+    Summarises a user's attempts per problem, read from the covering attempts(user_id, problem_id, day, success)
+    index.
+
+    Returns:
+        dict[int, tuple[int, int]]: Mapping problem_id -> (solved, last_day), where solved is 1 if any attempt
+                                    succeeded and last_day is the epoch day of the latest attempt.
+    """
+
+    cur = connection().cursor()
+
+    cur.execute(
+        """
+        SELECT problem_id, MAX(success), MAX(day)
+        FROM attempts
+        WHERE user_id = ?
+        GROUP BY problem_id
+        """,
+        (user_id,)
+    )
+
+    return {problem_id: (solved, last_day) for problem_id, solved, last_day in cur.fetchall()}
@@ -0,0 +1,54 @@
+"""
+Dates are stored as "YYYY-MM-DD" text, which is what the CLI reads and prints, and each date column has an
+integer twin counting days since 1970-01-01 ("epoch days"). Windows, recency and due checks compare and
+subtract those integers instead of parsing and formatting dates.
+"""
+from datetime import date, datetime
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# SQL expression converting a "YYYY-MM-DD" column to its epoch day (NULL if it isn't a valid date). julianday()
+# of a date is its midnight, and 2440587.5 is 1970-01-01's
+EPOCH_DAY_SQL = "CAST(julianday({}) - 2440587.5 AS INTEGER)"
+
+def to_day(value: str | date) -> int:
+    """
+    Returns the epoch day of a "YYYY-MM-DD" string, date or datetime.
+
+    Raises:
+        ValueError: If value is a string that isn't an ISO date.
+    """
+
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def is_date(value) -> bool:
+    """
+    Returns whether value is a "YYYY-MM-DD" date string, the only form SQLite converts to an epoch day.
+    """
+
+    if not isinstance(value, str) or len(value) != 10 or value[4] != "-" or value[7] != "-":
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def from_day(day: int) -> str:
+    """
+    Returns the "YYYY-MM-DD" string of an epoch day.
+    """
+
+    return date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+
+def today() -> int:
+    """
+    Returns today's epoch day (local time).
+    """
+
+    return datetime.now().toordinal() - EPOCH_ORDINAL
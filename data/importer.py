@@ -0,0 +1,202 @@
+import csv
+import json
+import os
+import re
+import time
+from typing import Callable, Iterator
+
+from .database import transaction
+from .database_access import validate_attempt, get_or_create_problems
+from .scheduler import replay_review_states
+from .topic_mastery import record_attempts_after
+from .users import DEFAULT_USER_ID
+
+from constants import IMPORT_CHUNK_SIZE
+from profiling import timed
+
+# Fields every imported attempt must have, in the same order as the `log` command's arguments
+FIELDS = ("slug", "date", "time_taken", "confidence", "success")
+
+def read_attempts(path: str) -> Iterator[tuple[int, dict | None]]:
+    """
+    Streams attempt records from a CSV file (with a header row naming FIELDS) or a JSONL file (one object with
+    FIELDS as keys per line). The format is picked from the file extension.
+
+    Yields:
+        tuple[int, dict | None]: Line number in the file and the raw record, None if the line isn't valid JSON.
+    """
+
+    with open(path, newline="", encoding="utf-8") as f:
+        if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson"):
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                # A malformed line is reported like any other invalid row, rather than ending the import midway
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError:
+                    yield line_no, None
+        else:
+            # Header is line 1, so records start on line 2
+            for line_no, record in enumerate(csv.DictReader(f), start=2):
+                yield line_no, record
+
+
+def _parse_int(value) -> int | None:
+    """
+    Returns value as an int if it is one exactly: an int (not a bool) or a string of digits, optionally signed and
+    padded with spaces. Anything else (e.g. 2.5, "2.5", "3 min") is None, rather than truncated or coerced.
+    """
+
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and re.fullmatch(r"\s*[+-]?\d+\s*", value):
+        return int(value)
+    return None
+
+
+def parse_attempt(record: dict | None) -> tuple[tuple | None, str | None]:
+    """
+    Converts a raw record into an attempt row, applying the same validity checks as log_attempt.
+
+    Returns:
+        tuple: ((slug, date, time_taken, confidence, success), None) if the record is valid,
+               (None, error message) otherwise.
+    """
+
+    if record is None:
+        return None, "Invalid JSON."
+    if not isinstance(record, dict):
+        return None, "Record must be a JSON object."
+
+    # A short CSV row has None for its missing fields, and an empty cell is as good as missing
+    for field in FIELDS:
+        if record.get(field) is None or record[field] == "":
+            return None, f"Missing field '{field}'."
+
+    slug = record["slug"]
+    date = record["date"]
+    time_taken = _parse_int(record["time_taken"])
+    confidence = _parse_int(record["confidence"])
+    success = _parse_int(record["success"])
+
+    if time_taken is None or confidence is None or success is None:
+        return None, "time_taken, confidence, and success must be integers."
+
+    error = validate_attempt(slug, time_taken, confidence, success, date)
+    if error:
+        return None, error
+
+    return (slug, date, time_taken, confidence, success), None
+
+
+def _resolve_slugs(slugs: set[str], problem_ids: dict[str, int | None]):
+    """
+    Adds the problem id of every slug in slugs to problem_ids (None if it can't be found). Uncached slugs are
+    fetched from the LeetCode API in concurrent batches.
+    """
+
+    missing = [slug for slug in slugs if slug not in problem_ids]
+    if missing:
+        problem_ids.update(get_or_create_problems(missing))
+
+
+def _insert_chunk(rows: list[tuple]):
+    """
+    Inserts a chunk of (user_id, problem_id, date, time_taken, confidence, success) rows and adds them to the
+    topic buckets, in one transaction.
+    """
+
+    with transaction() as conn:
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM attempts").fetchone()[0]
+
+        conn.executemany(
+            """
+            INSERT INTO attempts(user_id, problem_id, date, time_taken, confidence, success)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            rows
+        )
+
+        record_attempts_after(conn, last_id)
+
+
+@timed()
+def import_attempts(path: str, chunk_size: int = IMPORT_CHUNK_SIZE,
+                    progress: Callable[[int, float], None] | None = None, user_id: int = DEFAULT_USER_ID) -> dict:
+    """
+    Bulk-imports a user's attempts from a CSV or JSONL file (see read_attempts).
+
+    Records are validated like log_attempt, their slugs resolved in bulk and inserted chunk_size at a time with
+    one transaction per chunk. Review states are replayed once per problem at the end, in date order over the
+    problem's whole history, which matches logging the attempts one by one in date order.
+
+    Args:
+        path (str): Path of the file to import.
+        chunk_size (int): Number of attempts inserted per transaction.
+        progress (Callable[[int, float], None] | None): Called after every chunk with the number of attempts
+                                                         imported so far and the elapsed seconds.
+        user_id (int): User the attempts are logged for.
+
+    Returns:
+        dict: Summary of the import.
+              Ex. {"imported": 1200, "errors": [(14, "Confidence must be between 1 and 5, inclusive.")],
+                   "seconds": 0.8}
+    """
+
+    start = time.perf_counter()
+
+    problem_ids = {}
+    imported_problems = set()
+    errors = []
+    imported = 0
+
+    def flush(chunk: list[tuple[int, tuple]]):
+        nonlocal imported
+
+        _resolve_slugs({attempt[0] for _, attempt in chunk}, problem_ids)
+
+        rows = []
+        for line_no, (slug, date, time_taken, confidence, success) in chunk:
+            problem_id = problem_ids[slug]
+
+            if problem_id is None:
+                errors.append((line_no, f'Problem with slug "{slug}" not found in database or LeetCode.'))
+                continue
+
+            rows.append((user_id, problem_id, date, time_taken, confidence, success))
+            imported_problems.add(problem_id)
+
+        _insert_chunk(rows)
+        imported += len(rows)
+
+        if progress:
+            progress(imported, time.perf_counter() - start)
+
+    chunk = []
+
+    # Chunks are committed as they go, so the ones already in are scheduled even if reading the file fails later
+    try:
+        for line_no, record in read_attempts(path):
+            attempt, error = parse_attempt(record)
+
+            if error:
+                errors.append((line_no, error))
+                continue
+
+            chunk.append((line_no, attempt))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+
+        if chunk:
+            flush(chunk)
+    finally:
+        # One replay per problem, instead of rescheduling on every attempt
+        replay_review_states(user_id=user_id, problem_ids=sorted(imported_problems))
+
+    return {
+        "imported": imported,
+        "errors": errors,
+        "seconds": time.perf_counter() - start
+    }
@@ -0,0 +1,69 @@
+from collections import Counter
+import time
+
+from .api import FOUND, NOT_FOUND, FAILED
+
+from constants import LOOKUP_NOT_FOUND_TTL, LOOKUP_FAILED_TTL
+
+# Counts of how slug lookups were answered in this process:
+#   "hit": problem already cached, "negative_hit": a remembered failure, "miss": had to ask the API
+lookup_stats = Counter()
+
+_TTLS = {NOT_FOUND: LOOKUP_NOT_FOUND_TTL, FAILED: LOOKUP_FAILED_TTL}
+
+def remembered_failures(cur, slugs: list[str]) -> dict[str, str]:
+    """
+    Returns the slugs whose last lookup failed recently enough to not be retried yet.
+
+    Returns:
+        dict[str, str]: Mapping slug -> NOT_FOUND or FAILED, for slugs with an unexpired negative entry.
+    """
+
+    placeholders = ",".join("?" * len(slugs))
+    cur.execute(
+        f"SELECT slug, status, checked_at FROM slug_lookups WHERE slug IN ({placeholders}) AND status != ?",
+        (*slugs, FOUND)
+    )
+
+    now = time.time()
+    return {
+        slug: status for slug, status, checked_at in cur.fetchall()
+        if now - checked_at < _TTLS[status]
+    }
+
+
+def record_lookups(cur, statuses: dict[str, str]):
+    """
+    Remembers the outcome (FOUND, NOT_FOUND or FAILED) of looking up each slug, timestamped now. FOUND entries
+    record when the cached metadata was last confirmed.
+    """
+
+    now = time.time()
+    cur.executemany(
+        """
+        INSERT INTO slug_lookups(slug, status, checked_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(slug)
+        DO UPDATE SET status=excluded.status, checked_at=excluded.checked_at
+        """,
+        [(slug, status, now) for slug, status in statuses.items()]
+    )
+
+
+def stale_slugs(cur, max_age: float) -> list[str]:
+    """
+    Returns the slugs of cached problems whose metadata hasn't been confirmed within max_age seconds, including
+    problems that were never looked up (e.g. added manually).
+    """
+
+    cur.execute(
+        """
+        SELECT p.slug
+        FROM problems p
+        LEFT JOIN slug_lookups l ON l.slug = p.slug AND l.status = ?
+        WHERE l.checked_at IS NULL OR l.checked_at < ?
+        """,
+        (FOUND, time.time() - max_age)
+    )
+
+    return [row[0] for row in cur.fetchall()]
@@ -1,7 +1,62 @@
-from datetime import datetime, timedelta
-from .database import get_conn
+import heapq
+import json
+import math
+from typing import Iterable, Iterator, NamedTuple
 
-from constants import CONF_REVIEW_DAYS
+from .database import connection, transaction
+from .days import to_day, from_day, today as current_day
+from .users import DEFAULT_USER_ID
+
+from constants import (
+    CONF_REVIEW_DAYS, REVIEW_FETCH_SIZE, ATTEMPT_FETCH_SIZE,
+    SM2_INITIAL_EASE, SM2_MIN_EASE, SM2_MAX_INTERVAL,
+    SM2_QUALITY, SM2_FAIL_QUALITY,
+    REVIEW_DAILY_CAPACITY, REVIEW_PRIORITY_CONF_DAYS,
+    REVIEW_PRIORITY_FAIL_DAYS, REVIEW_PRIORITY_MASTERY_DAYS
+    )
+from profiling import timed
+
+class ReviewRow(NamedTuple):
+    """
+    A scheduled review together with its problem's details.
+    """
+    problem_id: int
+    slug: str
+    title: str
+    difficulty: str
+    review_date: str
+
+class ReviewState(NamedTuple):
+    """
+    A user's spaced repetition state for a problem (SM-2): its ease, the interval (in days) until its next review,
+    the number of successful attempts in a row, and the epoch day of its last attempt.
+    """
+    ease: float
+    interval: int
+    repetitions: int
+    last_day: int
+
+class QueuedReview(NamedTuple):
+    """
+    A due review in the priority queue. priority is the review's effective days overdue: its real days overdue
+    plus its confidence and mastery boosts (see REVIEW_PRIORITY_*). Higher is more urgent.
+    """
+    problem_id: int
+    slug: str
+    title: str
+    difficulty: str
+    review_date: str
+    overdue_days: int
+    priority: float
+
+class ReviewCursor(NamedTuple):
+    """
+    Position in the due queue after a page of next_reviews. rank is the last review's priority as a day (smaller
+    is more urgent), which doesn't depend on the current date, and served counts the reviews given out so far.
+    """
+    rank: float
+    problem_id: int
+    served: int
 
 def next_review_days(confidence: int, success: int) -> int:
     """
@@ -13,88 +68,250 @@ def next_review_days(confidence: int, success: int) -> int:
     return CONF_REVIEW_DAYS[confidence]
 
 
-def schedule_review(problem_id: int, confidence: int, success: int):
+def review_boost_days(confidence: int, success: int) -> int:
     """
-    Inserts next review date into reviews table.
+    Determines how many days a review is moved up the due queue, based on the attempt that scheduled it.
     """
 
-    days = next_review_days(confidence, success)
-    review_date = (datetime.now() + timedelta(days=days)).strftime("%Y-%m-%d")
+    if success == 0:
+        return REVIEW_PRIORITY_FAIL_DAYS
+    return REVIEW_PRIORITY_CONF_DAYS * (5 - confidence)
 
-    conn = get_conn()
-    cur = conn.cursor()
 
-    # Inserts review. If there's already a pending review with same problem, update it
-    cur.execute(
+def review_quality(confidence: int, success: int) -> int:
+    """
+    Grades an attempt on SM-2's 0-5 quality scale (see SM2_QUALITY).
+    """
+
+    if success == 0:
+        return SM2_FAIL_QUALITY
+    return SM2_QUALITY[confidence]
+
+
+def next_state(state: ReviewState | None, day: int, confidence: int, success: int) -> ReviewState:
+    """
+    Applies an attempt made on day (an epoch day) to a problem's review state, returning the new state. state is
+    None for the problem's first attempt.
+    """
+
+    if state is None:
+        ease, interval, repetitions, last_day = SM2_INITIAL_EASE, 0, 0, day
+    else:
+        ease, interval, repetitions, last_day = state
+
+    quality = review_quality(confidence, success)
+
+    if quality < 3:
+        repetitions = 0
+        interval = next_review_days(confidence, success)
+    else:
+        if repetitions == 0:
+            interval = next_review_days(confidence, success)
+        else:
+            # A problem still solved after a late review was remembered for longer than its interval
+            interval = round(max(interval, day - last_day) * ease)
+        repetitions += 1
+
+    ease = max(SM2_MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    return ReviewState(ease, min(interval, SM2_MAX_INTERVAL), repetitions, day)
+
+
+def _save_states(conn, states: list[tuple]):
     """
-    INSERT INTO reviews(problem_id, review_date)
-    VALUES (?, ?)
-    ON CONFLICT(problem_id)
-    DO UPDATE SET review_date=excluded.review_date
-    """,
-    (problem_id, review_date)
+    Writes (user_id, problem_id, ReviewState, confidence, success) rows to review_states, and each problem's next
+    review, due interval days after its last attempt, to reviews.
+    """
+
+    conn.executemany(
+        """
+        INSERT INTO review_states(user_id, problem_id, ease, interval, repetitions, last_day)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, problem_id)
+        DO UPDATE SET ease=excluded.ease, interval=excluded.interval, repetitions=excluded.repetitions,
+                      last_day=excluded.last_day
+        """,
+        [(user_id, problem_id, *state) for user_id, problem_id, state, _, _ in states]
     )
-    
 
-    conn.commit()
-    conn.close()
+    conn.executemany(
+        """
+        INSERT INTO reviews(user_id, problem_id, review_date, boost_days)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, problem_id)
+        DO UPDATE SET review_date=excluded.review_date, boost_days=excluded.boost_days
+        """,
+        [
+            (user_id, problem_id, from_day(state.last_day + state.interval), review_boost_days(confidence, success))
+            for user_id, problem_id, state, confidence, success in states
+        ]
+    )
+
+
+@timed()
+def schedule_review(problem_id: int, confidence: int, success: int, conn=None, user_id: int = DEFAULT_USER_ID,
+                    date: str | None = None):
+    """
+    Updates a user's review state for a problem with an attempt, and schedules its next review from the
+    attempt's date. If conn is passed with an open transaction, the review is committed as part of it.
+
+    Args:
+        problem_id (int): Problem attempted.
+        confidence (int): Confidence of the attempt (1-5).
+        success (int): Whether the attempt succeeded (1) or not (0).
+        conn (sqlite3.Connection | None): Connection to write on, joining its transaction if one is open.
+        user_id (int): User who made the attempt.
+        date (str | None): Date of the attempt ("YYYY-MM-DD"). Defaults to today.
+    """
+
+    day = current_day() if date is None else to_day(date)
+
+    with transaction(conn) as conn:
+        row = conn.execute(
+            "SELECT ease, interval, repetitions, last_day FROM review_states WHERE user_id = ? AND problem_id = ?",
+            (user_id, problem_id)
+        ).fetchone()
+        state = ReviewState(*row) if row else None
+
+        # A back-dated attempt lands in the middle of the problem's history, which is replayed in date order
+        # (the attempt is already in the attempts table)
+        if state is not None and day < state.last_day:
+            replay_review_states(conn, user_id, [problem_id])
+            return
+
+        _save_states(conn, [(user_id, problem_id, next_state(state, day, confidence, success), confidence, success)])
+
+
+def _replay(rows) -> Iterator[tuple]:
+    """
+    Folds (user_id, problem_id, day, confidence, success) rows, ordered by user, problem and attempt, into each
+    problem's final (user_id, problem_id, ReviewState, confidence, success).
+    """
+
+    key = state = last = None
+
+    for user_id, problem_id, day, confidence, success in rows:
+        if (user_id, problem_id) != key:
+            if key is not None:
+                yield (*key, state, *last)
+            key, state = (user_id, problem_id), None
+
+        state = next_state(state, day, confidence, success)
+        last = (confidence, success)
+
+    if key is not None:
+        yield (*key, state, *last)
+
+
+@timed()
+def replay_review_states(conn=None, user_id: int | None = None, problem_ids: Iterable[int] | None = None,
+                         chunk_size: int = ATTEMPT_FETCH_SIZE):
+    """
+    Rebuilds review states and reviews from the attempts table, replaying every problem's attempts in date
+    order in one streaming pass. Used after importing attempts, when a back-dated attempt is logged, and after
+    changing the SM2_* constants.
+
+    Args:
+        conn (sqlite3.Connection | None): Connection to write on, joining its transaction if one is open.
+        user_id (int | None): User whose states are rebuilt. If None, every user's.
+        problem_ids (Iterable[int] | None): Problems whose states are rebuilt (needs user_id). If None, every
+                                           problem's.
+        chunk_size (int): Number of attempts read, and states written, at a time.
+    """
+
+    scopes = [[]]
+    if user_id is not None:
+        scopes = [[("user_id", user_id)]]
+        if problem_ids is not None:
+            scopes = [[("user_id", user_id), ("problem_id", problem_id)] for problem_id in problem_ids]
+
+    with transaction(conn) as conn:
+        for scope in scopes:
+            where = "".join(f" AND {column} = ?" for column, _ in scope)
+            params = [value for _, value in scope]
+
+            # Reviews without attempts (scheduled directly) have no history to replay, so are dropped too
+            conn.execute("DELETE FROM review_states WHERE 1" + where, params)
+            conn.execute("DELETE FROM reviews WHERE 1" + where, params)
+
+            # Same-day attempts are replayed in the order they were logged. The pass follows the per-problem index,
+            # which SQLite would otherwise trade for idx_attempts_user_day to save sorting by id
+            cur = conn.execute(
+                """
+                SELECT user_id, problem_id, day, confidence, success
+                FROM attempts INDEXED BY idx_attempts_user_problem_day
+                WHERE day IS NOT NULL""" + where + """
+                ORDER BY user_id, problem_id, day, id
+                """,
+                params
+            )
+
+            def rows():
+                while chunk := cur.fetchmany(chunk_size):
+                    yield from chunk
 
+            states = []
+            for state in _replay(rows()):
+                states.append(state)
+                if len(states) >= chunk_size:
+                    _save_states(conn, states)
+                    states = []
 
-def get_due_reviews(today: str | None = None) -> list[int]:
+            _save_states(conn, states)
+
+
+@timed()
+def get_due_reviews(today: str | None = None, user_id: int = DEFAULT_USER_ID) -> list[int]:
     """
-    Returns list of problem_ids due for review today or earlier. If no date is inputted, uses current date as "today".
+    Returns list of a user's problem_ids due for review today or earlier. If no date is inputted, uses current date
+    as "today".
     """
 
-    if today is None:
-        today = datetime.now().strftime("%Y-%m-%d")
+    day = current_day() if today is None else to_day(today)
 
-    conn = get_conn()
-    cur = conn.cursor()
+    cur = connection().cursor()
 
     cur.execute(
         """
         SELECT problem_id
         FROM reviews
-        WHERE review_date <= ?
+        WHERE user_id = ? AND review_day <= ?
         """,
-        (today,)
+        (user_id, day)
     )
 
     rows = cur.fetchall()
-    conn.close()
 
     return [r[0] for r in rows]
 
 
-def show_due_reviews(today: str | None = None) -> list[str]:
+@timed()
+def show_due_reviews(today: str | None = None, user_id: int = DEFAULT_USER_ID) -> list[str]:
     """
-    Returns list of problem slugs due for review today or earlier.
+    Returns list of a user's problem slugs due for review today or earlier.
     """
 
-    if today is None:
-        today = datetime.now().strftime("%Y-%m-%d")
+    day = current_day() if today is None else to_day(today)
 
-    conn = get_conn()
-    cur = conn.cursor()
+    cur = connection().cursor()
 
     cur.execute(
         """
         SELECT p.slug
         FROM reviews r
         JOIN problems p ON r.problem_id = p.id
-        WHERE r.review_date <= ?
-        ORDER BY r.review_date ASC
+        WHERE r.user_id = ? AND r.review_day <= ?
+        ORDER BY r.review_day ASC
         """,
-        (today,)
+        (user_id, day)
     )
 
     rows = cur.fetchall()
-    conn.close()
 
     return [r[0] for r in rows]
 
-def print_due_reviews():
-    reviews = show_due_reviews()
+def print_due_reviews(user_id: int = DEFAULT_USER_ID):
+    reviews = show_due_reviews(user_id=user_id)
 
     if not reviews:
         print("No reviews due today.")
@@ -106,36 +323,218 @@ def print_due_reviews():
         print(f"- {slug}")
 
 
-def get_review_schedule(problem_id: int | None = None) -> dict[int, str] | str | None:
+@timed()
+def get_review_schedule(problem_id: int | None = None, user_id: int = DEFAULT_USER_ID) -> dict[int, str] | str | None:
     """
-    Get the review schedule for problems.
+    Get a user's review schedule for problems.
     
     Args:
         problem_id (int | None): If provided, returns the review date string for that problem.
                                  If None, returns dict of all scheduled reviews.
+        user_id (int): User whose reviews are returned.
     
     Returns:
         str: Review date for a specific problem (if problem_id provided)
         dict[int, str]: Mapping of problem_id to review_date (if no problem_id provided)
         None: If problem has no scheduled review
     """
-    conn = get_conn()
-    cur = conn.cursor()
+    cur = connection().cursor()
     
     if problem_id is not None:
         # Get review date for specific problem
         cur.execute(
-            "SELECT review_date FROM reviews WHERE problem_id = ?",
-            (problem_id,)
+            "SELECT review_date FROM reviews WHERE user_id = ? AND problem_id = ?",
+            (user_id, problem_id)
         )
         row = cur.fetchone()
-        conn.close()
         return row[0] if row else None
     else:
         # Get all scheduled reviews
         cur.execute(
-            "SELECT problem_id, review_date FROM reviews ORDER BY review_date ASC"
+            "SELECT problem_id, review_date FROM reviews WHERE user_id = ? ORDER BY review_day ASC",
+            (user_id,)
         )
         rows = cur.fetchall()
-        conn.close()
         return {r[0]: r[1] for r in rows} if rows else {}
+
+
+@timed()
+def iter_reviews(until: str | None = None, after: tuple[str, int] | None = None, limit: int | None = None,
+                 chunk_size: int = REVIEW_FETCH_SIZE, user_id: int = DEFAULT_USER_ID) -> Iterator[ReviewRow]:
+    """
+    Streams a user's scheduled reviews with their problem's details from one joined query, in review date order. Rows
+    are fetched chunk_size at a time, so callers can print them as they arrive.
+
+    Args:
+        until (str | None): If provided, only reviews due on or before this date ("YYYY-MM-DD") are returned.
+        after (tuple[str, int] | None): Pagination cursor, the (review_date, problem_id) of the last row of the
+                                        previous page. Only rows after it are returned.
+        limit (int | None): Max. number of rows to return (page size). If None, returns every row.
+        chunk_size (int): Number of rows fetched from the database at a time.
+        user_id (int): User whose reviews are returned.
+
+    Yields:
+        ReviewRow: (problem_id, slug, title, difficulty, review_date)
+    """
+
+    conditions = ["r.user_id = ?"]
+    params = [user_id]
+
+    if until is not None:
+        conditions.append("r.review_day <= ?")
+        params.append(to_day(until))
+
+    # Keyset pagination: continuing from the cursor is an index seek, not an OFFSET skip
+    if after is not None:
+        conditions.append("(r.review_day, r.problem_id) > (?, ?)")
+        params.extend((to_day(after[0]), after[1]))
+
+    query = """
+        SELECT r.problem_id, p.slug, p.title, p.difficulty, r.review_date
+        FROM reviews r
+        JOIN problems p ON r.problem_id = p.id
+        WHERE """ + " AND ".join(conditions)
+    query += " ORDER BY r.review_day, r.problem_id"
+
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    cur = connection().cursor()
+    cur.execute(query, params)
+
+    while rows := cur.fetchmany(chunk_size):
+        for row in rows:
+            yield ReviewRow(*row)
+
+
+# A problem's topic names as a JSON array, read from problem_topics like every other topic query
+_TOPIC_NAMES_SQL = """
+    (SELECT json_group_array(t.name) FROM problem_topics pt JOIN topics t ON t.id = pt.topic_id
+     WHERE pt.problem_id = r.problem_id)
+"""
+
+def _mastery_boost(topics: list[str], mastery: dict[str, float]) -> float:
+    """
+    Days a review is moved up for the user's mastery of its problem's weakest topic. Topics without a score
+    (no attempts in the mastery window) count as unmastered, and problems without topics get no boost.
+    """
+
+    if not topics:
+        return 0.0
+    weakest = min(mastery.get(topic, 0.0) for topic in topics)
+    return REVIEW_PRIORITY_MASTERY_DAYS * (1 - min(max(weakest, 0.0), 1.0))
+
+
+def reviews_left_today(capacity: int = REVIEW_DAILY_CAPACITY, today: str | None = None,
+                       user_id: int = DEFAULT_USER_ID) -> int:
+    """
+    Returns how many more reviews a user can be given on a day: capacity minus the attempts they already logged
+    that day.
+    """
+
+    day = current_day() if today is None else to_day(today)
+
+    done = connection().execute(
+        "SELECT COUNT(*) FROM attempts WHERE user_id = ? AND day = ?",
+        (user_id, day)
+    ).fetchone()[0]
+
+    return max(capacity - done, 0)
+
+
+@timed()
+def next_reviews(limit: int = REVIEW_DAILY_CAPACITY, after: ReviewCursor | None = None, today: str | None = None,
+                 mastery: dict[str, float] | None = None, capacity: int | None = REVIEW_DAILY_CAPACITY,
+                 user_id: int = DEFAULT_USER_ID) -> tuple[list[QueuedReview], ReviewCursor | None]:
+    """
+    Returns the next page of a user's due reviews, most urgent first (see QueuedReview.priority).
+
+    Reviews are read from idx_reviews_user_rank in order of review day minus confidence boost, which is their
+    priority without the mastery boost. As the mastery boost is at most REVIEW_PRIORITY_MASTERY_DAYS, a review
+    is final once the index has moved that many days past it, so only the page and that lookahead are read, kept
+    in a heap, instead of every due review.
+
+    Args:
+        limit (int): Max. number of reviews to return (page size).
+        after (ReviewCursor | None): Cursor returned with the previous page. Only reviews after it are returned.
+        today (str | None): Date ("YYYY-MM-DD") reviews are due by. Defaults to the current date.
+        mastery (dict[str, float] | None): The user's topic mastery scores (see analytics.mastery). If None,
+                                           reviews get no mastery boost.
+        capacity (int | None): Max. number of reviews given out per day, across pages and counting attempts
+                               already logged that day. If None, every due review is returned.
+        user_id (int): User whose reviews are returned.
+
+    Returns:
+        tuple[list[QueuedReview], ReviewCursor | None]: The page, and the cursor for the next page (None once the
+                                                        queue or the day's capacity is exhausted).
+    """
+
+    day = current_day() if today is None else to_day(today)
+    served = after.served if after is not None else 0
+
+    if capacity is not None:
+        limit = min(limit, reviews_left_today(capacity, from_day(day), user_id) - served)
+    if limit <= 0:
+        return [], None
+
+    lookahead = REVIEW_PRIORITY_MASTERY_DAYS if mastery else 0
+
+    # The unary + stops SQLite from choosing idx_reviews_user_day for the due filter and sorting every due review.
+    # review_day is part of idx_reviews_user_rank, so the filter is still checked in the index
+    conditions = ["r.user_id = ?", "+r.review_day <= ?"]
+    params = [user_id, day]
+
+    # Reviews ranked before the cursor by the index can't be ranked after it once boosted, so the scan resumes at
+    # the cursor's day
+    if after is not None:
+        conditions.append("r.rank_day >= ?")
+        params.append(math.floor(after.rank))
+
+    # Topics are only read when there is mastery to boost reviews by
+    cur = connection().cursor()
+    cur.execute(
+        """
+        SELECT r.rank_day, r.problem_id, p.slug, p.title, p.difficulty, """ + (_TOPIC_NAMES_SQL if mastery else "NULL")
+        + """, r.review_date, r.review_day
+        FROM reviews r
+        JOIN problems p ON r.problem_id = p.id
+        WHERE """ + " AND ".join(conditions) + """
+        ORDER BY r.rank_day, r.problem_id
+        """,
+        params
+    )
+
+    cursor_key = (after.rank, after.problem_id) if after is not None else None
+    heap = []
+    page = []
+    last_rank = None
+
+    def pop():
+        nonlocal last_rank
+        rank, problem_id, slug, title, difficulty, review_date, review_day = heapq.heappop(heap)
+        page.append(QueuedReview(problem_id, slug, title, difficulty, review_date, day - review_day,
+                                 round(day - rank, 2)))
+        last_rank = rank
+
+    while len(page) < limit and (rows := cur.fetchmany(REVIEW_FETCH_SIZE)):
+        for rank_day, problem_id, slug, title, difficulty, topics, review_date, review_day in rows:
+            # Reviews ranked more than lookahead days earlier can no longer be overtaken
+            while heap and heap[0][0] < rank_day - lookahead and len(page) < limit:
+                pop()
+            if len(page) >= limit:
+                break
+
+            rank = rank_day - _mastery_boost(json.loads(topics), mastery) if mastery else rank_day
+            if cursor_key is None or (rank, problem_id) > cursor_key:
+                heapq.heappush(heap, (rank, problem_id, slug, title, difficulty, review_date, review_day))
+
+    cur.close()
+
+    while heap and len(page) < limit:
+        pop()
+
+    if len(page) < limit:
+        return page, None
+
+    return page, ReviewCursor(last_rank, page[-1].problem_id, served + len(page))
@@ -0,0 +1,270 @@
+from .database import connection, transaction
+from .days import to_day
+from .users import DEFAULT_USER_ID
+from analytics.scoring import speed_score
+from profiling import timed
+
+@timed()
+def record_attempt(cur, user_id: int, problem_id: int, date: str, time_taken: int, confidence: int, success: int):
+    """
+    Adds a user's attempt to their daily bucket of each of its problem's topics, and of its difficulty.
+
+    Runs on the caller's cursor, so the buckets are committed in the same transaction as the attempt itself.
+    """
+
+    cur.execute("SELECT difficulty FROM problems WHERE id = ?", (problem_id,))
+    difficulty = cur.fetchone()[0]
+
+    speed = speed_score(time_taken, difficulty)
+    day = to_day(date)
+
+    cur.execute(
+        """
+        INSERT INTO topic_mastery(user_id, day, topic, attempts, success_sum, conf_sum, speed_sum, time_sum)
+        SELECT ?, ?, t.name, 1, ?, ?, ?, ?
+        FROM problem_topics pt
+        JOIN topics t ON t.id = pt.topic_id
+        WHERE pt.problem_id = ?
+        ON CONFLICT(user_id, day, topic)
+        DO UPDATE SET
+            attempts = attempts + 1,
+            success_sum = success_sum + excluded.success_sum,
+            conf_sum = conf_sum + excluded.conf_sum,
+            speed_sum = speed_sum + excluded.speed_sum,
+            time_sum = time_sum + excluded.time_sum
+        """,
+        (user_id, day, success, confidence, speed, time_taken, problem_id)
+    )
+
+    cur.execute(
+        """
+        INSERT INTO difficulty_mastery(user_id, day, difficulty, attempts, success_sum, conf_sum, speed_sum, time_sum)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+        ON CONFLICT(user_id, day, difficulty)
+        DO UPDATE SET
+            attempts = attempts + 1,
+            success_sum = success_sum + excluded.success_sum,
+            conf_sum = conf_sum + excluded.conf_sum,
+            speed_sum = speed_sum + excluded.speed_sum,
+            time_sum = time_sum + excluded.time_sum
+        """,
+        (user_id, day, difficulty, success, confidence, speed, time_taken)
+    )
+
+
+@timed()
+def record_attempts_after(conn, after_id: int):
+    """
+    Adds every attempt with an id greater than after_id to the daily topic and difficulty buckets, each as a single
+    GROUP BY over the attempts. Used for bulk inserts, where updating the buckets row by row would be wasteful.
+
+    Runs on the caller's connection, joining its transaction if one is open.
+    """
+
+    conn.create_function("speed_score", 2, speed_score, deterministic=True)
+
+    conn.execute(
+        """
+        INSERT INTO topic_mastery(user_id, day, topic, attempts, success_sum, conf_sum, speed_sum, time_sum)
+        SELECT a.user_id, a.day, t.name, COUNT(*), SUM(a.success), SUM(a.confidence),
+               SUM(speed_score(a.time_taken, p.difficulty)), SUM(a.time_taken)
+        FROM attempts a
+        JOIN problems p ON a.problem_id = p.id
+        JOIN problem_topics pt ON pt.problem_id = a.problem_id
+        JOIN topics t ON t.id = pt.topic_id
+        WHERE a.id > ? AND a.day IS NOT NULL
+        GROUP BY a.user_id, a.day, t.name
+        ON CONFLICT(user_id, day, topic)
+        DO UPDATE SET
+            attempts = attempts + excluded.attempts,
+            success_sum = success_sum + excluded.success_sum,
+            conf_sum = conf_sum + excluded.conf_sum,
+            speed_sum = speed_sum + excluded.speed_sum,
+            time_sum = time_sum + excluded.time_sum
+        """,
+        (after_id,)
+    )
+
+    conn.execute(
+        """
+        INSERT INTO difficulty_mastery(user_id, day, difficulty, attempts, success_sum, conf_sum, speed_sum, time_sum)
+        SELECT a.user_id, a.day, p.difficulty, COUNT(*), SUM(a.success), SUM(a.confidence),
+               SUM(speed_score(a.time_taken, p.difficulty)), SUM(a.time_taken)
+        FROM attempts a
+        JOIN problems p ON a.problem_id = p.id
+        WHERE a.id > ? AND a.day IS NOT NULL
+        GROUP BY a.user_id, a.day, p.difficulty
+        ON CONFLICT(user_id, day, difficulty)
+        DO UPDATE SET
+            attempts = attempts + excluded.attempts,
+            success_sum = success_sum + excluded.success_sum,
+            conf_sum = conf_sum + excluded.conf_sum,
+            speed_sum = speed_sum + excluded.speed_sum,
+            time_sum = time_sum + excluded.time_sum
+        """,
+        (after_id,)
+    )
+
+
+@timed()
+def rebuild_topic_mastery(conn=None):
+    """
+    Recomputes every user's daily topic and difficulty buckets from the attempts table.
+
+    Needed whenever the scoring constants in constants.py (e.g. EXPECTED_TIMES) change, since the stored speed
+    sums were computed with the old values.
+
+    Args:
+        conn (sqlite3.Connection | None): Connection to rebuild on, joining its transaction if one is open.
+    """
+
+    with transaction(conn) as conn:
+        conn.execute("DELETE FROM topic_mastery")
+        conn.execute("DELETE FROM difficulty_mastery")
+        record_attempts_after(conn, 0)
+
+
+@timed()
+def get_topic_totals(since: int, user_id: int = DEFAULT_USER_ID) -> list[tuple]:
+    """
+    Sums a user's daily buckets of every topic from the given day onwards. Buckets older than since simply age
+    out of the window, so no expiry bookkeeping is needed on insert.
+
+    Args:
+        since (int): First day of the window as an epoch day (see data.days), inclusive.
+        user_id (int): User whose buckets are summed.
+
+    Returns:
+        List of tuples (topic, attempts, success_sum, conf_sum, speed_sum, last_day), one per topic. last_day is
+        the epoch day of the latest attempt.
+    """
+
+    cur = connection().cursor()
+
+    cur.execute(
+        """
+        SELECT topic, SUM(attempts), SUM(success_sum), SUM(conf_sum), SUM(speed_sum), MAX(day)
+        FROM topic_mastery
+        WHERE user_id = ? AND day >= ?
+        GROUP BY topic
+        """,
+        (user_id, since)
+    )
+
+    rows = cur.fetchall()
+
+    return rows
+
+
+@timed()
+def get_topic_counts(user_id: int = DEFAULT_USER_ID) -> dict[str, int]:
+    """
+    Returns mapping of topic -> a user's all-time number of attempts, read from the daily buckets.
+    """
+
+    cur = connection().cursor()
+
+    cur.execute(
+        """
+        SELECT topic, SUM(attempts)
+        FROM topic_mastery
+        WHERE user_id = ?
+        GROUP BY topic
+        """,
+        (user_id,)
+    )
+
+    rows = cur.fetchall()
+
+    return dict(rows)
+
+
+@timed()
+def get_cohort_topic_totals(since: int, user_ids: list[int] | None = None) -> list[tuple]:
+    """
+    get_topic_totals for every user (or for the users in user_ids) at once, as one grouped query, so a whole
+    cohort's mastery doesn't take a query per user.
+
+    Args:
+        since (int): First day of the window as an epoch day (see data.days), inclusive.
+        user_ids (list[int] | None): If provided, only these users' totals are returned.
+
+    Returns:
+        List of tuples (user_id, topic, attempts, success_sum, conf_sum, speed_sum, last_day), one per user and
+        topic. last_day is the epoch day of the user's latest attempt at the topic.
+    """
+
+    conditions = ["day >= ?"]
+    params = [since]
+
+    if user_ids is not None:
+        conditions.append(f"user_id IN ({','.join('?' * len(user_ids))})")
+        params.extend(user_ids)
+
+    cur = connection().cursor()
+
+    cur.execute(
+        """
+        SELECT user_id, topic, SUM(attempts), SUM(success_sum), SUM(conf_sum), SUM(speed_sum), MAX(day)
+        FROM topic_mastery
+        WHERE """ + " AND ".join(conditions) + """
+        GROUP BY user_id, topic
+        """,
+        params
+    )
+
+    rows = cur.fetchall()
+
+    return rows
+
+
+# Daily bucket tables (and their group column) by what they're grouped by
+BUCKETS = {"topic": ("topic_mastery", "topic"), "difficulty": ("difficulty_mastery", "difficulty")}
+
+@timed()
+def get_daily_buckets(by: str, start: int | None, end: int, user_id: int = DEFAULT_USER_ID,
+                      group: str | None = None) -> list[tuple]:
+    """
+    Returns a user's daily buckets between two days, per topic or per difficulty.
+
+    Args:
+        by (str): "topic" or "difficulty" (see BUCKETS).
+        start (int | None): First day as an epoch day (see data.days), inclusive. None for the first bucket.
+        end (int): Last day as an epoch day, inclusive.
+        user_id (int): User whose buckets are read.
+        group (str | None): If provided, only this topic's or difficulty's buckets are returned.
+
+    Returns:
+        List of tuples (group, day, attempts, success_sum, conf_sum, speed_sum, time_sum), ordered by day. group is
+        the bucket's topic or difficulty.
+    """
+
+    table, column = BUCKETS[by]
+
+    conditions = ["user_id = ?", "day <= ?"]
+    params = [user_id, end]
+
+    if start is not None:
+        conditions.append("day >= ?")
+        params.append(start)
+
+    if group is not None:
+        conditions.append(f"{column} = ?")
+        params.append(group)
+
+    cur = connection().cursor()
+
+    # Both tables' primary key (user_id, day, group) serves the range in day order
+    cur.execute(
+        f"""
+        SELECT {column}, day, attempts, success_sum, conf_sum, speed_sum, time_sum
+        FROM {table}
+        WHERE """ + " AND ".join(conditions) + """
+        ORDER BY day
+        """,
+        params
+    )
+
+    rows = cur.fetchall()
+
+    return rows
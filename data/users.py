@@ -0,0 +1,42 @@
+from .database import connection, transaction
+
+from constants import DEFAULT_USER
+
+# Row id of DEFAULT_USER, created together with the users table
+DEFAULT_USER_ID = 1
+
+def get_user_id(name: str = DEFAULT_USER, conn=None, create: bool = False) -> int | None:
+    """
+    Returns the id of the user with the given name.
+
+    Args:
+        name (str): Name of the user.
+            Ex. "alice"
+        conn (sqlite3.Connection | None): Connection to use, joining its transaction if one is open.
+        create (bool): Whether to add the user if there is none with this name yet, as when logging their first
+                       attempt. Otherwise None is returned for an unknown user.
+    """
+
+    if conn is None:
+        conn = connection()
+
+    # Existing users are a plain read, so e.g. `stats` doesn't count as a write
+    row = conn.execute("SELECT id FROM users WHERE name = ?", (name,)).fetchone()
+    if row:
+        return row[0]
+    if not create:
+        return None
+
+    with transaction(conn) as conn:
+        return conn.execute("INSERT INTO users(name) VALUES (?)", (name,)).lastrowid
+
+
+def get_user_names() -> dict[int, str]:
+    """
+    Returns mapping of user id -> name for every user.
+    """
+
+    cur = connection().cursor()
+    cur.execute("SELECT id, name FROM users")
+
+    return dict(cur.fetchall())
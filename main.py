@@ -1,18 +1,48 @@
 import sys
-from datetime import datetime
 
-from data.database import init_db
-from data.database_access import add_problem, log_attempt, get_problem_by_slug, get_or_create_problem
-from data.scheduler import get_due_reviews, get_review_schedule
-from analytics.stats import generate_report
+# Subsystems are imported inside the command that uses them, so e.g. `help` or `schedule` never pays for importing
+# requests or the analytics modules
 
-init_db()
+# Commands that read or write the database, which needs its schema in place first
+DB_COMMANDS = {"log", "import", "add", "catalog", "refresh", "stats", "report-all", "recommend", "cohort", "progress",
+               "reviews", "schedule", "rebuild"}
+
+# Commands that add the user given with --user if it doesn't exist yet. Any other command reports an unknown user,
+# so a mistyped name doesn't leave an empty trainee behind
+USER_CREATING_COMMANDS = {"log", "import"}
+
+# Commands handed to a running server (`serve`). Commands taking file paths always run in-process
+FORWARDED_COMMANDS = {
+    "log", "add", "refresh", "stats", "recommend", "cohort", "progress", "reviews", "schedule", "rebuild"
+}
 
 def print_usage():
     """Display CLI usage information."""
     usage = """
 USE:
-    python main.py <command> [arguments]
+    python main.py <command> [arguments] [--user <name>] [--profile] [--cprofile <file>]
+
+OPTIONS:
+    --user <name>
+        Run the command as this user. Attempts, reviews and stats are kept
+        per user, while the problem cache is shared. The user is created by
+        their first `log` or `import`. Defaults to DEFAULT_USER (see
+        constants.py).
+        
+        Ex: python main.py stats --user alice
+
+    --profile
+        Print where the command spent its time to stderr: a tree of timed
+        calls, the slowest SQL statements and counters (API requests, cache
+        hits). The command runs in-process, even if a server is running.
+        
+        Ex: python main.py stats --profile
+
+    --cprofile <file>
+        Run the command under cProfile and write its stats to file, for
+        `python -m pstats <file>`.
+        
+        Ex: python main.py stats --cprofile stats.prof
 
 COMMANDS:
     log <slug> <date> <time_min> <confidence> <success>
@@ -27,6 +57,16 @@ COMMANDS:
         
         Ex: python main.py log two-sum 2026-02-20 30 4 1
 
+    import <file>
+        Bulk import attempts from a CSV or JSONL file.
+        
+        Args:
+            file - Path to a .csv file with a header row, or a .jsonl file with
+                   one object per line. Both use the fields:
+                   slug, date, time_taken, confidence, success
+        
+        Ex: python main.py import history.csv
+
     add <slug> <title> <difficulty> <topic1,topic2,...>
         Add a problem to the local database. If problem doesn't exist,
         fetches from LeetCode API automatically.
@@ -39,6 +79,25 @@ COMMANDS:
         
         Ex: python main.py add two-sum "Two Sum" Easy "Array,Hash Table"
 
+    catalog <pull|load|export> [file]
+        Manage the offline problem catalog, so problems resolve without
+        calling the LeetCode API.
+        
+        Args:
+            pull - Download every LeetCode problem to the catalog file and load it
+            load - Load problems from a catalog file (only new or changed ones)
+            export - Write the local problems to a catalog file
+            file - Catalog file path, optional (defaults to catalog.jsonl.gz)
+        
+        Ex: python main.py catalog pull
+        Ex: python main.py catalog load team-catalog.jsonl.gz
+
+    refresh
+        Re-check cached problems whose metadata is older than
+        PROBLEM_REFRESH_TTL (see constants.py) against the LeetCode API.
+        
+        Example: python main.py refresh
+
     stats
         Display a comprehensive performance report including:
         - Total attempts and problems practiced
@@ -48,8 +107,51 @@ COMMANDS:
         
         Example: python main.py stats
 
+    report-all [--workers <n>] [--chunk-size <n>]
+        Display the stats report of every user, e.g. for a nightly job.
+        Users are split across worker processes, and the reports are printed
+        in the same order whatever the number of workers.
+        
+        Args:
+            --workers - Number of worker processes, optional (defaults to
+                        REPORT_WORKERS, one per CPU)
+            --chunk-size - Users handed to a worker at a time, optional
+                           (defaults to REPORT_CHUNK_SIZE)
+        
+        Example: python main.py report-all --workers 4
+
+    recommend
+        Display your weakest topics, each with problems to practise next:
+        problems you failed, solved a while ago (RECC_STALE_DAYS), or haven't
+        tried, at a difficulty suited to your mastery of the topic.
+        
+        Example: python main.py recommend
+
+    cohort
+        Display every user's weakest topics by mastery, computed for the
+        whole cohort at once (vectorized with NumPy if it's installed).
+        
+        Example: python main.py cohort
+
+    progress <topic|difficulty> [name] [start] [end] [--format csv|json]
+        Show how your mastery, success rate and average time changed over
+        time, per topic or per difficulty. Each day's values are over the
+        MASTERY_DAYS_WINDOW days ending on it.
+        
+        Args:
+            topic|difficulty - Group progress by topic or by difficulty
+            name - Only show this topic or difficulty (e.g., "Hash Table"), optional
+            start - First date (YYYY-MM-DD), optional (defaults to your first attempt)
+            end - Last date (YYYY-MM-DD), optional (defaults to today)
+            --format - Print every day's values as csv or json instead of a summary
+        
+        Example: python main.py progress topic
+        Example: python main.py progress topic "Dynamic Programming" 2025-01-01
+        Example: python main.py progress difficulty 2026-01-01 --format csv > progress.csv
+
     reviews <date>
-        Show problems due for review, either today or on a specified date.
+        Show problems due for review, either today or on a specified date, most
+        urgent first and at most REVIEW_DAILY_CAPACITY per day.
         
         Args:
             date - Specific date (YYYY-MM-DD), optional (defaults to today)
@@ -66,14 +168,31 @@ COMMANDS:
         Example: python main.py schedule
         Example: python main.py schedule two-sum
 
+    rebuild
+        Recompute the stored topic mastery sums and review schedules from every
+        logged attempt. Run this after changing the scoring or SM2_* constants
+        in constants.py.
+        
+        Example: python main.py rebuild
+
+    serve
+        Run a background server on localhost (SERVER_HOST:SERVER_PORT in
+        constants.py) that keeps the database and analytics warm. While it
+        runs, other commands are answered by it; they fall back to running
+        in-process when it isn't running.
+        
+        Example: python main.py serve
+
     help
         Show this usage information.
 """
     print(usage)
 
 
-def cmd_log(args: list):
+def cmd_log(args: list, user_id: int):
     """Handle 'log' command."""
+    from data.database_access import log_attempt
+
     if len(args) < 5:
         print("Error: log requires 5 arguments: <slug> <date> <time_min> <confidence> <success>")
         return
@@ -89,7 +208,7 @@ def cmd_log(args: list):
         print("Error: time_min, confidence, and success must be integers")
         return
     
-    result = log_attempt(slug, date, time_taken, confidence, success)
+    result = log_attempt(slug, date, time_taken, confidence, success, user_id)
     
     if result["success"]:
         print(f"Attempt logged successfully (ID: {result['attempt_id']})")
@@ -97,8 +216,42 @@ def cmd_log(args: list):
         print(f"Error: {result['error']}")
 
 
+def cmd_import(args: list, user_id: int):
+    """Handle 'import' command."""
+    from data.importer import import_attempts
+    from data.lookup_cache import lookup_stats
+
+    if len(args) < 1:
+        print("Error: import requires 1 argument: <file>")
+        return
+
+    def report_progress(imported: int, seconds: float):
+        print(f"\rImported {imported} attempts ({imported / seconds:.0f} rows/s)", end="", flush=True)
+
+    try:
+        result = import_attempts(args[0], progress=report_progress, user_id=user_id)
+    except (OSError, ValueError) as e:
+        print(f"Error: could not read '{args[0]}': {str(e)}")
+        return
+
+    rate = result["imported"] / result["seconds"] if result["seconds"] else 0
+    print(f"\rImported {result['imported']} attempts in {result['seconds']:.1f}s ({rate:.0f} rows/s).")
+
+    print(f"Problem lookups: {lookup_stats['hit']} cached, {lookup_stats['negative_hit']} known failures, "
+          f"{lookup_stats['miss']} fetched from LeetCode.")
+
+    if result["errors"]:
+        print(f"Skipped {len(result['errors'])} invalid rows:")
+        for line_no, error in result["errors"][:10]:
+            print(f"  Line {line_no}: {error}")
+        if len(result["errors"]) > 10:
+            print(f"  ... and {len(result['errors']) - 10} more.")
+
+
 def cmd_add(args: list):
     """Handle 'add' command."""
+    from data.database_access import get_problem_by_slug, get_or_create_problem
+
     if len(args) < 4:
         print("Error: add requires 4 arguments: <slug> <title> <difficulty> <topics>")
         return
@@ -131,43 +284,216 @@ def cmd_add(args: list):
         print(f"Problem added: {slug}.")
 
 
-def cmd_stats():
+def cmd_catalog(args: list):
+    """Handle 'catalog' command."""
+    from data.catalog import pull_catalog, load_catalog, export_catalog
+    from constants import CATALOG_FILE
+
+    if len(args) < 1 or args[0] not in ("pull", "load", "export"):
+        print("Error: catalog requires an action: pull, load or export")
+        return
+
+    action = args[0]
+    path = args[1] if len(args) > 1 else CATALOG_FILE
+
+    if action == "export":
+        count = export_catalog(path)
+        print(f"Exported {count} problems to {path}.")
+        return
+
+    try:
+        counts = pull_catalog(path) if action == "pull" else load_catalog(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: could not read catalog '{path}': {str(e)}")
+        return
+
+    if counts is None:
+        print("Could not fetch the problem list from LeetCode API.")
+        return
+
+    print(f"Catalog loaded from {path}: {counts['added']} added, {counts['updated']} updated, "
+          f"{counts['unchanged']} unchanged.")
+    if counts["conflicts"]:
+        print(f"Skipped {counts['conflicts']} problems whose slug belongs to a different problem id locally.")
+
+
+def cmd_refresh():
+    """Handle 'refresh' command."""
+    from data.catalog import refresh_stale_problems
+
+    counts = refresh_stale_problems()
+    print(f"Refreshed problems: {counts['updated']} updated, {counts['unchanged']} unchanged, "
+          f"{counts['failed']} could not be checked.")
+    if counts["conflicts"]:
+        print(f"Skipped {counts['conflicts']} problems whose slug belongs to a different problem id locally.")
+
+
+def cmd_stats(user_id: int):
     """Handle 'stats' command."""
-    report = generate_report()
+    from analytics.stats import generate_report
+
+    report = generate_report(user_id)
     print(report)
 
 
-def cmd_reviews(args: list):
+def cmd_report_all(args: list):
+    """Handle 'report-all' command."""
+    from analytics.batch import generate_reports
+    from data.users import get_user_names
+    from constants import REPORT_WORKERS, REPORT_CHUNK_SIZE
+
+    options = {"--workers": REPORT_WORKERS, "--chunk-size": REPORT_CHUNK_SIZE}
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            value = args[i + 1] if i + 1 < len(args) else ""
+            if not value.isdigit() or int(value) < 1:
+                print(f"Error: {option} must be a positive integer")
+                return
+            options[option] = int(value)
+            args = args[:i] + args[i + 2:]
+
+    names = get_user_names()
+    reports = generate_reports(workers=options["--workers"], chunk_size=options["--chunk-size"])
+
+    for user_id, report in sorted(reports.items(), key=lambda x: names[x[0]]):
+        print(f"User: {names[user_id]}")
+        print(report)
+        print()
+
+
+def cmd_recommend(user_id: int):
+    """Handle 'recommend' command."""
+    from analytics.recommender import recommend_topics, recommend_problems
+
+    topics = recommend_topics(user_id=user_id)
+
+    if not topics:
+        print("Not enough data yet. Log some attempts first.")
+        return
+
+    for topic, problems in recommend_problems(user_id, topics).items():
+        print(f"{topic} ({dict(topics)[topic]:.2f}):")
+        for problem in problems:
+            print(f"  • {problem.title} ({problem.slug}) - {problem.difficulty}, {problem.reason}")
+        if not problems:
+            print("  No problems left to practise.")
+
+
+def cmd_cohort():
+    """Handle 'cohort' command."""
+    from analytics.cohort import calculate_cohort_mastery
+    from data.users import get_user_names
+    from constants import NUM_RECC
+
+    cohort = calculate_cohort_mastery()
+    names = get_user_names()
+
+    if not cohort:
+        print("No attempts logged in the mastery window.")
+        return
+
+    print("Weakest topics by user:")
+    for user_id, mastery in sorted(cohort.items(), key=lambda x: names.get(x[0], "")):
+        weakest = sorted(mastery.items(), key=lambda x: x[1])[:NUM_RECC]
+        print(f"  {names.get(user_id, user_id)}: " + ", ".join(f"{topic} ({score:.2f})" for topic, score in weakest))
+
+
+def cmd_progress(args: list, user_id: int):
+    """Handle 'progress' command."""
+    from data.days import is_date
+    from data.topic_mastery import BUCKETS
+    from analytics.progress import progress_series, write_csv, write_json
+
+    output = None
+    if "--format" in args:
+        i = args.index("--format")
+        output = args[i + 1] if i + 1 < len(args) else None
+        args = args[:i] + args[i + 2:]
+        if output not in ("csv", "json"):
+            print("Error: --format must be csv or json")
+            return
+
+    if not args or args[0] not in BUCKETS:
+        print("Error: Usage: progress <topic|difficulty> [name] [start] [end] [--format csv|json]")
+        return
+
+    by, args = args[0], args[1:]
+    group = args.pop(0) if args and not is_date(args[0]) else None
+
+    dates = args[:2]
+    if not all(is_date(date) for date in dates):
+        print("Error: dates must be in YYYY-MM-DD format")
+        return
+
+    series = progress_series(by, *dates, user_id=user_id, group=group)
+
+    if output == "csv":
+        write_csv(series, sys.stdout, by)
+        return
+    if output == "json":
+        write_json(series, sys.stdout)
+        return
+
+    series = {group: points for group, points in series.items() if points}
+    if not series:
+        print("No attempts logged in this period.")
+        return
+
+    first_date = min(points[0].date for points in series.values())
+    last_date = max(points[-1].date for points in series.values())
+
+    print(f"Progress by {by}, {first_date} to {last_date}:")
+    for group, points in series.items():
+        first, last = points[0], points[-1]
+        print(f"  {group}: mastery {first.mastery:.2f} -> {last.mastery:.2f}, "
+              f"success rate {first.success_rate:.0%} -> {last.success_rate:.0%}, "
+              f"avg time {first.avg_time:.1f} -> {last.avg_time:.1f} min, "
+              f"{sum(point.attempts for point in points)} attempts")
+
+
+def cmd_reviews(args: list, user_id: int):
     """Handle 'reviews' command."""
+    from data.days import is_date, from_day, today as current_day
+    from data.scheduler import next_reviews, reviews_left_today
+    from analytics.mastery import calculate_mastery
+    from constants import REVIEW_DAILY_CAPACITY
+
     date = None
     if len(args) > 0:
         date = args[0]
+        if not is_date(date):
+            print("Error: date must be in YYYY-MM-DD format")
+            return
     
-    due_problems = get_due_reviews(date)
-    
-    if not due_problems:
-        today = date if date else datetime.now().strftime("%Y-%m-%d")
-        print(f"No reviews due on {today}.")
+    today = date or from_day(current_day())
+
+    # Only the day's most urgent reviews are read, however many are due
+    mastery = calculate_mastery(user_id)
+    reviews, cursor = next_reviews(today=today, mastery=mastery, user_id=user_id)
+
+    if not reviews:
+        if reviews_left_today(today=today, user_id=user_id) == 0:
+            print(f"Daily review capacity ({REVIEW_DAILY_CAPACITY}) reached on {today}.")
+        else:
+            print(f"No reviews due on {today}.")
         return
-    
-    print(f"Problems due for review ({date or datetime.now().strftime('%Y-%m-%d')}):")
-    conn = __import__('data.database', fromlist=['get_conn']).get_conn()
-    cur = conn.cursor()
-    
-    for problem_id in due_problems:
-        cur.execute(
-            "SELECT slug, title, difficulty FROM problems WHERE id = ?",
-            (problem_id,)
-        )
-        row = cur.fetchone()
-        if row:
-            print(f"  • {row[1]} ({row[0]}) - {row[2]}")
-    
-    conn.close()
+
+    print(f"Problems due for review ({today}), most urgent first:")
+    for review in reviews:
+        overdue = f", {review.overdue_days} days overdue" if review.overdue_days > 0 else ""
+        print(f"  • {review.title} ({review.slug}) - {review.difficulty}{overdue}")
+
+    # The cursor's rank includes the mastery boost, so the lookahead ranks the rest of the queue the same way
+    if cursor is not None and next_reviews(1, cursor, today, mastery, capacity=None, user_id=user_id)[0]:
+        print(f"\nMore reviews are due. Up to {REVIEW_DAILY_CAPACITY} are shown per day (REVIEW_DAILY_CAPACITY).")
 
 
-def cmd_schedule(args: list):
+def cmd_schedule(args: list, user_id: int):
     """Handle 'schedule' command."""
+    from data.database_access import get_problem_by_slug
+    from data.scheduler import iter_reviews, get_review_schedule
+
     if len(args) > 0:
         slug = args[0]
         problem = get_problem_by_slug(slug)
@@ -177,7 +503,7 @@ def cmd_schedule(args: list):
             return
         
         problem_id = problem[0]
-        schedule = get_review_schedule(problem_id)
+        schedule = get_review_schedule(problem_id, user_id)
         
         if schedule:
             print(f"Review schedule for '{slug}':")
@@ -185,48 +511,145 @@ def cmd_schedule(args: list):
         else:
             print(f"No review scheduled for '{slug}'.")
     else:
-        # Show all reviews
-        schedule = get_review_schedule()
-        
-        if not schedule:
+        # Show all reviews, sorted chronologically
+        printed = False
+
+        for review in iter_reviews(user_id=user_id):
+            if not printed:
+                print("Review Schedule (all problems):")
+                printed = True
+            print(f" - {review.title} ({review.slug}) - Review on {review.review_date}")
+
+        if not printed:
             print("No reviews scheduled.")
-            return
-        
-        print("Review Schedule (all problems):")
-        conn = __import__('data.database', fromlist=['get_conn']).get_conn()
-        cur = conn.cursor()
-        
-        for problem_id, review_date in sorted(schedule.items(), key=lambda x: x[1]):
-            cur.execute(
-                "SELECT slug, title FROM problems WHERE id = ?",
-                (problem_id,)
-            )
-            row = cur.fetchone()
-            if row:
-                print(f" - {row[1]} ({row[0]}) - Review on {review_date}")
-        
-        conn.close()
 
 
-def main():
-    """Main CLI entry point."""
-    if len(sys.argv) < 2:
-        print_usage()
+def cmd_rebuild():
+    """Handle 'rebuild' command."""
+    from data.topic_mastery import rebuild_topic_mastery
+    from data.scheduler import replay_review_states
+
+    rebuild_topic_mastery()
+    replay_review_states()
+    print("Topic mastery and review schedules rebuilt from attempt history.")
+
+
+def pop_user(args: list) -> tuple[str | None, list]:
+    """
+    Splits a `--user <name>` option out of a command's arguments.
+
+    Returns:
+        tuple[str | None, list]: The user's name (DEFAULT_USER if the option isn't given, None if it has no
+                                 name) and the remaining arguments.
+    """
+    from constants import DEFAULT_USER
+
+    if "--user" not in args:
+        return DEFAULT_USER, args
+
+    i = args.index("--user")
+    if i + 1 >= len(args):
+        return None, args[:i]
+
+    return args[i + 1], args[:i] + args[i + 2:]
+
+
+def pop_profile(args: list) -> tuple[bool, str | None, list]:
+    """
+    Splits the `--profile` flag and a `--cprofile <file>` option out of a command's arguments.
+
+    Returns:
+        tuple[bool, str | None, list]: Whether --profile was given, the cProfile output file ("" if the option has
+                                       no file, None if it isn't given) and the remaining arguments.
+    """
+
+    profile = "--profile" in args
+    args = [arg for arg in args if arg != "--profile"]
+
+    if "--cprofile" not in args:
+        return profile, None, args
+
+    i = args.index("--cprofile")
+    if i + 1 >= len(args):
+        return profile, "", args[:i]
+
+    return profile, args[i + 1], args[:i] + args[i + 2:]
+
+
+def run_profiled(cmd: str, args: list, profile: bool, cprofile_path: str | None):
+    """Run a command in this process under --profile and/or --cprofile, reporting to stderr."""
+    import profiling
+
+    if profile:
+        profiling.start()
+
+    profiler = None
+    if cprofile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        with profiling.span(cmd):
+            run_command(cmd, args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+            print(f"\ncProfile stats written to {cprofile_path} (python -m pstats {cprofile_path})", file=sys.stderr)
+
+        if profile:
+            from data.lookup_cache import lookup_stats
+
+            root = profiling.stop()
+            for outcome, n in lookup_stats.items():
+                profiling.counters[f"problem_lookup.{outcome}"] += n
+            profiling.print_report(root)
+
+
+def run_command(cmd: str, args: list):
+    """Run a command in this process."""
+    user, args = pop_user(args)
+    if user is None:
+        print("Error: --user requires a name")
         return
-    
-    cmd = sys.argv[1].lower()
-    args = sys.argv[2:] if len(sys.argv) > 2 else []
+
+    user_id = None
+    if cmd in DB_COMMANDS:
+        from data.database import init_db
+        from data.users import get_user_id
+        init_db()
+        user_id = get_user_id(user, create=cmd in USER_CREATING_COMMANDS)
+        if user_id is None:
+            print(f"Error: unknown user '{user}'. Users are added when their first attempt is logged or imported.")
+            return
     
     if cmd == "log":
-        cmd_log(args)
+        cmd_log(args, user_id)
+    elif cmd == "import":
+        cmd_import(args, user_id)
     elif cmd == "add":
         cmd_add(args)
+    elif cmd == "catalog":
+        cmd_catalog(args)
+    elif cmd == "refresh":
+        cmd_refresh()
     elif cmd == "stats":
-        cmd_stats()
+        cmd_stats(user_id)
+    elif cmd == "report-all":
+        cmd_report_all(args)
+    elif cmd == "recommend":
+        cmd_recommend(user_id)
+    elif cmd == "cohort":
+        cmd_cohort()
+    elif cmd == "progress":
+        cmd_progress(args, user_id)
     elif cmd == "reviews":
-        cmd_reviews(args)
+        cmd_reviews(args, user_id)
     elif cmd == "schedule":
-        cmd_schedule(args)
+        cmd_schedule(args, user_id)
+    elif cmd == "rebuild":
+        cmd_rebuild()
     elif cmd == "help" or cmd == "-h" or cmd == "--help":
         print_usage()
     else:
@@ -234,5 +657,40 @@ def main():
         print("Use 'python main.py help' for usage information")
 
 
+def main():
+    """Main CLI entry point."""
+    if len(sys.argv) < 2:
+        print_usage()
+        return
+    
+    cmd = sys.argv[1].lower()
+    args = sys.argv[2:] if len(sys.argv) > 2 else []
+
+    profile, cprofile_path, args = pop_profile(args)
+    if cprofile_path == "":
+        print("Error: --cprofile requires a file")
+        return
+
+    # Profiled commands run here rather than on the server, so the profile covers them
+    if profile or cprofile_path:
+        run_profiled(cmd, args, profile, cprofile_path)
+        return
+
+    if cmd == "serve":
+        from server import serve
+        serve()
+        return
+
+    # If a server is running for this database, let it answer from its warm state
+    if cmd in FORWARDED_COMMANDS:
+        from client import forward
+        output = forward(cmd, args)
+        if output is not None:
+            print(output, end="")
+            return
+
+    run_command(cmd, args)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,303 @@
+"""
+Lightweight instrumentation of the hot paths, enabled by `--profile` (see main.py).
+
+While profiling is on:
+- functions decorated with @timed record a span (calls and wall time), nested into a call tree
+- every SQL statement on connections opened by data.database.get_conn is counted through sqlite3's trace callback,
+  per span and per statement, and timed across its execute and fetch calls (see TracedConnection)
+- count() tallies events such as API requests and cache hits
+
+While it is off (the default), an instrumented function costs one extra call and a flag check, and connections are
+plain sqlite3 connections. Importing this module is kept cheap too, as every database command does.
+"""
+from collections import Counter
+from functools import wraps
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+# inspect.CO_GENERATOR, without importing inspect (which would add to every command's startup)
+_CO_GENERATOR = 0x20
+
+class Span:
+    """
+    A node of the call tree: calls and total seconds of one span name under its parent, and the SQL statements
+    run directly in it.
+    """
+
+    __slots__ = ("name", "calls", "seconds", "statements", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.statements = 0
+        self.children = {}
+
+
+# Root of the call tree while profiling, None while it's off
+_root = None
+_stack = []
+
+# Normalised SQL statement -> [executions, seconds]
+statements = {}
+
+# Event tallies, e.g. "api.requests". Incremented from the API's worker threads too, hence the lock
+counters = Counter()
+_counters_lock = threading.Lock()
+
+def enabled() -> bool:
+    """
+    Returns whether profiling is on.
+    """
+
+    return _root is not None
+
+
+def start():
+    """
+    Turns profiling on, clearing any earlier results.
+    """
+    global _root
+
+    _root = Span("total")
+    _root.calls = 1
+    _stack[:] = [_root]
+    statements.clear()
+    counters.clear()
+    _root.seconds = -time.perf_counter()
+
+
+def stop() -> Span | None:
+    """
+    Turns profiling off, returning the root of the call tree.
+    """
+    global _root
+
+    root = _root
+    if root is not None:
+        root.seconds += time.perf_counter()
+        _root = None
+        _stack.clear()
+    return root
+
+
+def count(name: str, n: int = 1):
+    """
+    Adds n to the counter name, if profiling is on.
+    """
+
+    if _root is not None:
+        with _counters_lock:
+            counters[name] += n
+
+
+def _enter(name: str, call: bool = True) -> Span:
+    parent = _stack[-1]
+    node = parent.children.get(name)
+    if node is None:
+        node = parent.children[name] = Span(name)
+    if call:
+        node.calls += 1
+    _stack.append(node)
+    return node
+
+
+def _exit(node: Span, started: float):
+    node.seconds += time.perf_counter() - started
+    _stack.pop()
+
+
+class span:
+    """
+    Context manager timing a block as a span named name. Does nothing while profiling is off.
+    """
+
+    __slots__ = ("name", "node", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.node = None
+
+    def __enter__(self):
+        if _root is not None:
+            self.node = _enter(self.name)
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.node is not None and _root is not None:
+            _exit(self.node, self.started)
+        return False
+
+
+def _timed_iter(name: str, iterator):
+    """
+    Yields from iterator, adding the time spent producing each item to the span name (as one call).
+    """
+
+    call = True
+    while _root is not None:
+        node = _enter(name, call)
+        call = False
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _exit(node, started)
+        yield item
+
+    # Profiling was stopped mid-iteration
+    yield from iterator
+
+
+def timed(name: str | None = None):
+    """
+    Decorator recording every call of the function as a span, named after the function unless name is given.
+    Generator functions are timed across all of their items.
+    """
+
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        if fn.__code__.co_flags & _CO_GENERATOR:
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if _root is None:
+                    return fn(*args, **kwargs)
+                return _timed_iter(label, fn(*args, **kwargs))
+        else:
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if _root is None:
+                    return fn(*args, **kwargs)
+                node = _enter(label)
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    _exit(node, started)
+
+        return wrapper
+
+    return decorate
+
+
+# Traced statements have their bound values expanded, so literals are replaced with ? to group executions together.
+# The patterns are compiled on first use, so only profiled runs pay for it
+_patterns = None
+
+def _statement(sql: str) -> list:
+    """
+    Returns the [executions, seconds] entry of a statement, as SQL text or as traced.
+    """
+    global _patterns
+
+    if _patterns is None:
+        _patterns = re.compile(r"[xX]?'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b"), re.compile(r"\s+")
+    literals, spaces = _patterns
+
+    key = literals.sub("?", spaces.sub(" ", sql).strip())
+    entry = statements.get(key)
+    if entry is None:
+        entry = statements[key] = [0, 0.0]
+    return entry
+
+
+def trace_sql(statement: str):
+    """
+    sqlite3 trace callback (see Connection.set_trace_callback) counting a statement's execution, including each
+    execution of an executemany and statements run by SQLite itself (e.g. COMMIT).
+    """
+
+    if _root is None or not _stack:
+        return
+
+    _statement(statement)[0] += 1
+    _stack[-1].statements += 1
+
+
+class TracedCursor(sqlite3.Cursor):
+    """
+    Cursor adding the time spent in its execute and fetch calls to its statement's entry in statements.
+    """
+
+    _entry = None
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._entry is not None and _root is not None:
+                self._entry[1] += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        self._entry = _statement(sql)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._entry = _statement(sql)
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+    def __next__(self):
+        return self._timed(super().__next__)
+
+
+class TracedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors (including those of its execute shortcuts) are TracedCursors. get_conn only opens
+    these while profiling.
+    """
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _print_span(node: Span, depth: int, file):
+    label = "  " * depth + node.name
+    print(f"{label:<48} {node.seconds * 1000:10.2f} ms {node.calls:8} calls {node.statements:6} sql", file=file)
+
+    for child in sorted(node.children.values(), key=lambda child: child.seconds, reverse=True):
+        _print_span(child, depth + 1, file)
+
+
+def print_report(root: Span, top: int = 10, file=sys.stderr):
+    """
+    Prints the call tree under root, the top SQL statements by time, and the counters.
+    """
+
+    print("\nProfile", file=file)
+    _print_span(root, 0, file)
+
+    if statements:
+        total = sum(executions for executions, _ in statements.values())
+        print(f"\nSQL: {total} statements, top {min(top, len(statements))} by time", file=file)
+        ranked = sorted(statements.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        for statement, (executions, seconds) in ranked:
+            text = statement if len(statement) <= 90 else statement[:87] + "..."
+            print(f"{seconds * 1000:10.2f} ms {executions:8}x  {text}", file=file)
+
+    if counters:
+        print("\nCounters", file=file)
+        for name, value in sorted(counters.items()):
+            print(f"  {name:<30} {value}", file=file)
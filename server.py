@@ -0,0 +1,166 @@
+"""
+Optional long-running server for the CLI. It keeps the database connection, imported modules and recent
+command output warm, so commands forwarded by `main.py` (or polled by a dashboard) don't pay for interpreter
+startup, imports or recomputation.
+
+Start it with `python main.py serve`. Commands can then be sent as:
+    POST /  with JSON {"cmd": "stats", "args": [], "db": "<absolute database path>"}
+    GET /stats, GET /reviews/2026-02-21, ...
+and the response body is the command's printed output. POST runs the commands `main.py` forwards, while GET only
+runs the read-only CACHED_COMMANDS: any web page can make a browser send a GET to localhost, but not a JSON POST.
+The client side is client.forward.
+"""
+from contextlib import redirect_stdout
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import io
+import json
+import os
+from urllib.parse import unquote
+
+from main import FORWARDED_COMMANDS
+from constants import SERVER_HOST, SERVER_PORT
+
+# Commands whose output only depends on the data (and today's date), so it can be cached until the next write
+CACHED_COMMANDS = {"stats", "recommend", "cohort", "progress", "reviews", "schedule"}
+
+# Max. number of cached outputs kept for the current generation (see data.database.generation)
+CACHE_SIZE = 256
+
+def _db_path() -> str:
+    import data.database as database
+    return os.path.abspath(database.DB_NAME)
+
+
+class TrainerServer(HTTPServer):
+    """
+    Runs CLI commands on one thread, with one warm database connection, caching the output of read-only
+    commands until the database is next written to (by this server or any other process).
+    """
+
+    def __init__(self, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        super().__init__((host, port), _Handler)
+        self.db_path = _db_path()
+
+        # Requests must name this server in their Host header, so a page on another domain resolving to localhost
+        # (DNS rebinding) can't reach it
+        self.hosts = {f"{name}:{self.server_address[1]}" for name in (host, "localhost")}
+        self.cache = {}
+        self.cache_version = None
+
+    def run(self, cmd: str, args: list) -> str:
+        from data.database import generation
+        from main import run_command
+
+        cmd = cmd.lower()
+        version = generation()
+
+        # Any data written since the cache was filled invalidates all of it. Results stored by the analytics cache
+        # don't bump the generation, so they leave this cache alone
+        if version != self.cache_version:
+            self.cache.clear()
+            self.cache_version = version
+
+        key = (cmd, tuple(args), date.today())
+        if key in self.cache:
+            return self.cache[key]
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            run_command(cmd, args)
+        output = out.getvalue()
+
+        if cmd in CACHED_COMMANDS and generation() == version:
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.pop(next(iter(self.cache)))
+            self.cache[key] = output
+
+        return output
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if not self._check_host():
+            return
+
+        parts = [unquote(part) for part in self.path.strip("/").split("/") if part]
+        if not parts or parts[0].lower() not in CACHED_COMMANDS:
+            self._reply(404, "")
+            return
+
+        self._reply(200, self.server.run(parts[0], parts[1:]))
+
+    def do_POST(self):
+        if not self._check_host():
+            return
+
+        # Browsers only send a cross-site POST as JSON after a CORS preflight, which this server never answers
+        if self.headers.get_content_type() != "application/json":
+            self._reply(415, "Expected a JSON body.")
+            return
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            cmd, args = body["cmd"].lower(), body.get("args", [])
+        except (TypeError, ValueError, KeyError, AttributeError):
+            cmd = args = None
+        if not isinstance(args, list):
+            self._reply(400, "Expected a JSON object with a cmd and a list of args.")
+            return
+
+        if cmd not in FORWARDED_COMMANDS:
+            self._reply(404, "")
+            return
+
+        # A client working on a different database file must not be answered from this one
+        if body.get("db") != self.server.db_path:
+            self._reply(409, "Server is running on a different database.")
+            return
+
+        self._reply(200, self.server.run(cmd, args))
+
+    def _check_host(self) -> bool:
+        if self.headers.get("Host") in self.server.hosts:
+            return True
+        self._reply(403, "Unexpected Host header.")
+        return False
+
+    def _reply(self, status: int, text: str):
+        raw = text.encode()
+
+        # A refused request's body may not have been read, so the connection can't carry another one
+        if status != 200:
+            self.close_connection = True
+
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+def serve(host: str = SERVER_HOST, port: int = SERVER_PORT):
+    """
+    Runs the server until interrupted.
+    """
+
+    from data.database import init_db
+    init_db()
+
+    # Warming the imports and connection up front, so the first request is as fast as the rest
+    import analytics.stats
+    import data.database_access
+    import data.scheduler
+
+    with TrainerServer(host, port) as server:
+        print(f"Serving on http://{host}:{port} for {server.db_path} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+